@@ -1,280 +1,24 @@
 #!/usr/bin/env python3
 
-from PIL import Image, ImageOps
-from moviepy.editor import VideoFileClip, concatenate_videoclips
 from time import time
-from multiprocessing import Process
-from threading import Thread
-import numpy as np
-import cv2
-import os
-import re
+from PIL import Image
 import argparse
-import tomllib
-
-if (not os.path.exists('PyASCII/output')):
-    os.makedirs('PyASCII/output')
-if (not os.path.exists('PyASCII/temp')):
-    os.makedirs('PyASCII/temp')
-else:
-    for file in os.listdir("PyASCII/temp"):
-        file_path = os.path.join("PyASCII/temp", file)
-        if os.path.isfile(file_path):
-            os.remove(file_path)
-
-def load_filters():
-    with open('filters.toml', 'rb') as file:
-        filters = tomllib.load(file)
-    return filters
-
-#### Image Tools ####
-
-# Muda a resolução da imagem sem perder a proporção
-def resize_image(image, ref_size):
-    rows, cols = image.size
-    if rows < cols:
-        cols = int((cols / rows) * ref_size)
-        rows = ref_size
-    elif rows == cols:
-        cols = ref_size
-        rows = ref_size
-    else:
-        rows = int((rows / cols) * ref_size)
-        cols = ref_size
-    return image.resize((rows, cols), Image.LANCZOS)
-
-# Transformar o valor do pixel de 0 a 255 em 0 a 16
-def pixel_value_to_index(pixel_value):
-    return int((pixel_value / 255) * 16)
-
-def image_processing(image_name, resolution, high_contrast, sprites, output_file):
-    image = Image.open(image_name).convert("L")
-    image = resize_image(image, resolution)
-    if high_contrast:
-        image = ImageOps.equalize(image)
-    output_width, output_height = image.size
-
-    output_image = Image.new("RGB", (output_width, output_height))
-    for y in range(0, output_height, sprite_height):
-        for x in range(0, output_width, sprite_width):
-            pixel_value = image.getpixel((x, y))
-            index = pixel_value_to_index(pixel_value)
-            sprite = sprites[index]
-            output_image.paste(sprite, (x, y))
-
-    # Salva a imagem final como png
-    if output_file != None:
-        output_image.save(f"{output_file}")
-    else:
-        output_image.save("./PyASCII/output/PyAscii_image.png")
-
-##### GIF Tools #####
-
-def gif_processing(gif_name, resolution, high_contrast, sprites, output_file):
-    gif = Image.open(gif_name)
-    frames = []
-    durations = []
-
-    for frame in range(0, gif.n_frames):
-        gif.seek(frame)
-        image = gif.convert("L")
-        image = resize_image(image, resolution)
-        if high_contrast:
-            image = ImageOps.equalize(image)
-
-        output_width, output_height = image.size
-        output_image = Image.new("RGB", (output_width, output_height))
-        for y in range(0, output_height, sprite_height):
-            for x in range(0, output_width, sprite_width):
-                pixel_value = image.getpixel((x, y))
-                index = pixel_value_to_index(pixel_value)
-                sprite = sprites[index]
-                output_image.paste(sprite, (x, y))
-
-        frames.append(output_image)
-        durations.append(gif.info['duration'])
-
-    if output_file != None:
-        frames[0].save(output_file, save_all=True, append_images=frames[1:], duration=durations, loop=0)
-    else:
-        frames[0].save("./PyASCII/output/PyAscii_gif.gif", save_all=True, append_images=frames[1:], duration=durations, loop=0)
-
-
-##### Video Tools #####
-
-def extrair_frames(input_video_path):
-    cap = cv2.VideoCapture(input_video_path)
-    frames = []
-    
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        frames.append(frame)
-    
-    cap.release()
-    return frames
-
-# Função para salvar frames como um novo vídeo
-def salvar_frames(frames, output_path, fps):
-    height, width, layers = frames[0].shape
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v') # ou 'XVID' para .avi
-    video = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-    
-    for frame in frames:
-        video.write(frame)
-    
-    video.release()
-
-def load_sprites(sprite_sheet_image, sprite_width, sprite_height, monochrome_filter):
-    # Função para obter um sprite individual
-    def get_sprite(x, y):
-        sprite = sprite_sheet_image.crop((x, y, x + sprite_width, y + sprite_height))
-        return sprite
-    
-    sheet_width, sheet_height = sprite_sheet_image.size
-    filters = load_filters()
-    
-    if monochrome_filter != None:
-        if monochrome_filter not in filters:
-            print(f"[ KeyError ] '{monochrome_filter}' is not recognized as a filter!")
-            exit()
-
-        for y in range(0, sheet_height):
-            for x in range(0, sheet_width):
-                pixel_value = sprite_sheet_image.getpixel((x, y))
-                if pixel_value == (255, 255, 255, 255):
-                    sprite_sheet_image.putpixel((x, y), tuple(filters[monochrome_filter][0]))
-                else:
-                    sprite_sheet_image.putpixel((x, y), tuple(filters[monochrome_filter][1]))
-    
-    sprites = []
-    for y in range(0, sprite_sheet_image.height, sprite_height):
-        for x in range(0, sprite_sheet_image.width, sprite_width):
-            sprite = get_sprite(x, y)
-            sprites.append(sprite)
-
-    return sprites
-
-# Função para processar cada subclipe
-def process_subclip(sprites, subclip, ct, ref, high_contrast):
-    frames = extrair_frames(subclip)
-    fps = cv2.VideoCapture(subclip).get(cv2.CAP_PROP_FPS)
-
-    for i in range(len(frames)):
-        # Carregar a imagem em escala de cinza
-        image = Image.fromarray(cv2.cvtColor(frames[i], cv2.COLOR_BGR2RGB)).convert("L")
-        image = resize_image(image, ref)
-        if high_contrast:
-            image = ImageOps.equalize(image) # Equaliza a imagem (aumenta contraste)
-        output_width, output_height = image.size
-
-        output_image = Image.new("RGB", (output_width, output_height))
-        for y in range(0, output_height, sprite_height):
-            for x in range(0, output_width, sprite_width):
-                pixel_value = image.getpixel((x, y))
-                index = pixel_value_to_index(pixel_value)
-                sprite = sprites[index]
-                output_image.paste(sprite, (x, y))
-
-        frames[i] = cv2.cvtColor(np.array(output_image), cv2.COLOR_RGB2BGR)
-
-    os.remove(f"./PyASCII/temp/subclip_{ct}.mp4") # Deleta subclipe antigo
-
-    height, width, layers = frames[0].shape
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v') # ou 'XVID' para .avi
-    video = cv2.VideoWriter(f"./PyASCII/temp/processed_subclip{ct}.mp4", fourcc, fps, (width, height))
-    
-    for frame in frames:
-        video.write(frame)
-    
-    video.release()
-
-def get_numeric_part(filename):
-    # Extrai a parte numérica do nome do arquivo
-    match = re.search(r'\d+', filename)
-    return int(match.group()) if match else float('inf')
-
-def video_processing(video_name, resolution, high_contrast, sprites, output_file):
-    video = VideoFileClip(filename=video_name, audio=False)
-    ref = resolution
-
-    time_frag = 5  # Tempo em segundos de cada subclipe
-
-    index = 0
-    start = 0
-    qtd_procs = 0    # Variável utilizada para mensurar a quantidade de processos simultâneos, Não deve ultrapassar os.cpu_count()!!!
-    ct = 0           # Contador de subclipe
-    frag_counter = 0 # Variável para representar o frag{}.mp4 (conjunto de subclipes)
-    while(True):
-        while(qtd_procs < (os.cpu_count() - 1)):
-            if start + time_frag >= video.duration:
-                end = video.duration
-                clip = video.subclip(start, end)
-                clip.write_videofile(f"./PyASCII/temp/subclip_{index}.mp4")
-                break
-            else:
-                end = start + time_frag
-                clip = video.subclip(start, end)
-                clip.write_videofile(f"./PyASCII/temp/subclip_{index}.mp4")
-                start += time_frag
-            index += 1
-            qtd_procs += 1
-        
-        files = sorted([os.path.join("PyASCII/temp", f) for f in os.listdir("PyASCII/temp") if f.startswith('subclip')], key=get_numeric_part)
-        procs = []
-        
-        for subclip in files:
-            if os.name == "nt": # Windows (Existe um bug envolvendo a leitura dos arquivos temporários quando Process() é utilizado no Windows, então foi necessário o uso de Thread())
-                proc = Thread(target=process_subclip, args=(sprites, subclip, ct, ref, high_contrast))
-            elif os.name == "posix": # Linux
-                proc = Process(target=process_subclip, args=(sprites, subclip, ct, ref, high_contrast))
-            procs.append(proc)
-            proc.start()
-            ct += 1
-
-        for proc in procs:
-            proc.join()  
-
-        files = [os.path.join("PyASCII/temp", f) for f in os.listdir("PyASCII/temp") if f.startswith('processed_subclip')]
-        clips = [VideoFileClip(f) for f in sorted(files, key=get_numeric_part)]
-        final_clip = concatenate_videoclips(clips)
-        final_clip.write_videofile(f'./PyASCII/temp/frag{frag_counter}.mp4', codec='libx264')
-        frag_counter += 1
-
-        for file in files:
-            os.remove(file) # Remove os subclipes temporários
-
-        if end == video.duration:
-            break
-
-        qtd_procs = 0
-    video.close()
-
-    # Une subclipes em um único clipe (sem áudio)
-    files = [os.path.join("PyASCII/temp", f) for f in os.listdir("PyASCII/temp") if f.startswith('frag')]
-    clips = [VideoFileClip(f) for f in sorted(files, key=get_numeric_part)]
-    final_clip = concatenate_videoclips(clips)
-    if output_file == None:
-        output_video_path = './PyASCII/output/PyASCII_noaudio.mp4'
-    else:
-        output_video_path = f"{output_file}_NoAudio.mp4"
-    final_clip.write_videofile(output_video_path, codec='libx264')
-
-    files = [os.path.join("PyASCII/temp", f) for f in os.listdir("PyASCII/temp") if os.path.isfile(os.path.join("PyASCII/temp", f))]
-    for file in files:
-        os.remove(file) # Remove os subclipes temporários
-
-    input_video_path = video_name
-    video_clip = VideoFileClip(input_video_path)
-    audio_clip = video_clip.audio
-    final_video = VideoFileClip(output_video_path)
-    final_video_with_audio = final_video.set_audio(audio_clip)
-    if output_file == None:
-        final_output_path = './PyASCII/output/PyASCII.mp4'
-    else:
-        final_output_path = output_file
-    final_video_with_audio.write_videofile(final_output_path, codec='libx264', audio_codec='aac')
+import sys
+import os
+from pyascii_core.processing import image_processing, gif_processing, video_processing
+from pyascii_core.renderer import SAMPLING_MODES, CONTRAST_MODES, DEFAULT_CONTRAST
+from pyascii_core.sprites import load_sprites
+from pyascii_core.grid_format import export_grid
+from pyascii_core.terminal import PLAYBACK_MODES, play_terminal
+from pyascii_core.batch import run_batch
+from pyascii_core.tiled import tiled_image
+from pyascii_core.paths import SCRATCH_ENV, default_output
+from pyascii_core.benchmark import run_benchmark
+from pyascii_core.profiling import start_profile, finish_profile
+from pyascii_core.probe import probe_media
+from pyascii_core.planner import plan_job
+from pyascii_core.chunk_cache import CHUNK_CACHE_ENV
+import json
 
 # Argument Parsing... 
 def parse_arguments():
@@ -282,81 +26,183 @@ def parse_arguments():
     parser.description = f"{parser.prog}. An ASCII filter for images and videos."
 
     parser.add_argument('-r', '--resolution', metavar='RES', default=720, type=int, help='Sets the resolution of the output image.')
-    parser.add_argument('-f', '--filter', metavar='FILTER', default=None,
-                        choices=list(load_filters().keys()), help='Applies a filter to the output.')
-    parser.add_argument('-m', '--media', metavar='MEDIA', required=True, help='Specifies the image/video to be used as input.')
-    parser.add_argument("-c", "--contrast", action='store_true', help='Increases image contrast.')
+    parser.add_argument('-f', '--filter', metavar='FILTER', default=None, help='Applies a filter from filters.toml to the output.')
+    parser.add_argument('-m', '--media', metavar='MEDIA', default=None, help='Specifies the image/video to be used as input.')
+    parser.add_argument("-c", "--contrast", metavar="MODE", nargs="?", const=DEFAULT_CONTRAST, default=None, choices=CONTRAST_MODES,
+                        help="Increases image contrast. In animations, 'scene' (default) keeps the same contrast until the scene changes, "
+                             "'running' follows the average of the recent frames and 'frame' equalizes each frame on its own.")
     parser.add_argument("-o", "--output", metavar="PATH", default=None, help='Changes the output path.')
+    parser.add_argument("-s", "--sampling", metavar="MODE", default="area", choices=SAMPLING_MODES,
+                        help="How each character cell is sampled: 'area' averages the cell, 'point' is the legacy top-left pixel sampling.")
+    parser.add_argument("--streaming", action='store_true', help='Converts videos in a single decode/encode pass, without temporary subclips.')
+    parser.add_argument("--chunk-size", metavar="FRAMES", default=None, type=int, help='Number of video frames per work chunk (default: 5 seconds of video).')
+    parser.add_argument("--max-memory", metavar="MB", default=None, type=int, help='Memory ceiling for frames held by the video and GIF pipelines, in megabytes.')
+    parser.add_argument("--shared-memory", action='store_true', help='Moves video frames between the decoder and the workers through shared memory.')
+    parser.add_argument("--play", metavar="MODE", nargs="?", const="ansi", default=None, choices=PLAYBACK_MODES,
+                        help="Plays the media as text in the terminal in real time ('ansi' (default) or 'plain'). "
+                             "MEDIA may also be a camera index such as 0.")
+    parser.add_argument("--tiled", action='store_true',
+                        help='Converts a very large image strip by strip, in parallel, writing a PNG; memory depends on the strip height, not on the image size.')
+    parser.add_argument("--strip-height", metavar="ROWS", default=None, type=int, help='Source rows per strip in tiled mode (default: about 64 MB per strip).')
+    parser.add_argument("--batch", metavar="SOURCE", nargs="+", default=None,
+                        help="Converts every image, GIF and video in the given folders, globs or manifest files (.txt/.list, one path per line). "
+                             "-o sets the output folder.")
+    parser.add_argument("--force", action='store_true', help='In batch mode, converts files even when their output is up to date.')
+    parser.add_argument("--benchmark", action='store_true',
+                        help='Runs the benchmark suite on synthetic media and saves the per-stage timings as JSON (-o sets the file).')
+    parser.add_argument("--baseline", metavar="JSON", default=None,
+                        help='In benchmark mode, compares the results with a saved run and exits with an error on regressions.')
+    parser.add_argument("--profile", metavar="TRACE", nargs="?", const="", default=None,
+                        help='Times every pipeline stage in every process and writes a Chrome trace (default: ./PyASCII/output/PyASCII_profile.json) and a summary table.')
+    parser.add_argument("--scratch-dir", metavar="DIR", default=None,
+                        help='Root folder for the temporary files of each job, e.g. /dev/shm (default: the system temporary folder).')
+    parser.add_argument("--chunk-cache", metavar="MB", default=None, type=int,
+                        help='Size limit of the cache of converted video chunks, which lets interrupted conversions resume and other filters '
+                             'reuse the conversion (default: 2048; 0 disables it).')
+    parser.add_argument("--dry-run", metavar="PLAN", nargs="?", const="", default=None,
+                        help='Probes the media and prints the conversion plan (workers, chunk size, estimated runtime and peak memory) '
+                             'without converting anything. PLAN also saves it as JSON.')
+    parser.add_argument("--workers", metavar="N", default=None, type=int, help='Number of worker processes for videos and GIFs (default: CPU count - 1).')
 
     args = parser.parse_args()
+    if args.media is None and args.batch is None and not args.benchmark:
+        parser.error("one of the arguments -m/--media, --batch or --benchmark is required")
     return args
 
-def is_image(file_path):
-    try:
-        with Image.open(file_path) as img:
-            img.verify()
-        return True
-    except (IOError, SyntaxError):
-        return False
-
-def is_video(file_path):
-    try:
-        video = cv2.VideoCapture(file_path)
-        if video.isOpened():
-            return True
-        return False
-    except Exception as e:
-        return False
-    finally:
-        video.release()
-
-def is_gif(file_path):
-    try:
-        with Image.open(file_path) as img:
-            if img.format == 'GIF':
-                return True
-        return False
-    except (IOError, SyntaxError):
-        return False
-
-
 if __name__ == "__main__":
     start_time = time()
 
     args = parse_arguments()
+    if args.scratch_dir:
+        os.environ[SCRATCH_ENV] = args.scratch_dir # Vale também para os processos dos pools
+    if args.chunk_cache is not None:
+        os.environ[CHUNK_CACHE_ENV] = str(args.chunk_cache)
+
+    if args.benchmark:
+        report = run_benchmark(output_file=args.output, baseline=args.baseline)
+        print(report)
+        exit(1 if report.regressions else 0)
 
     try:
         resolution = int(args.resolution)
-        sprite_sheet_image = Image.open("./sprite_sheet.png")
         sprite_height = 8
         sprite_width = 8
-        sprites = load_sprites(sprite_sheet_image, sprite_width, sprite_height, args.filter)
+        atlas, colors, palette = load_sprites(args.filter, sprite_width=sprite_width, sprite_height=sprite_height)
     except FileNotFoundError:
         print("[ FileNotFoundError ] Sprite Sheet not found!")
+        exit()
+    except (KeyError, ValueError) as error:
+        print(f"[ {type(error).__name__} ] {error.args[0]}")
+        exit()
+
+    if args.batch:
+        report = run_batch(sources=args.batch,
+                           output_dir=args.output,
+                           resolution=resolution,
+                           high_contrast=args.contrast,
+                           monochrome_filter=args.filter,
+                           sampling=args.sampling,
+                           workers=args.workers,
+                           force=args.force)
+        print(report)
+        exit()
 
+    if args.play:
+        try:
+            stats = play_terminal(source=args.media,
+                                  resolution=resolution,
+                                  high_contrast=args.contrast,
+                                  colors=colors,
+                                  palette=palette,
+                                  sprite_width=sprite_width,
+                                  sprite_height=sprite_height,
+                                  sampling=args.sampling,
+                                  mode=args.play)
+        except FileNotFoundError as error:
+            print(f"[ FileNotFoundError ] {error}", file=sys.stderr)
+            exit()
+        print(stats, file=sys.stderr)
+        exit()
 
-    if is_gif(args.media):
-        gif_processing(gif_name=args.media,
-                       resolution=resolution,
-                       high_contrast=args.contrast,
-                       sprites=sprites,
-                       output_file=args.output)
-    elif is_image(args.media):
-        image_processing(image_name=args.media,
-                         resolution=resolution,
-                         high_contrast=args.contrast,
-                         sprites=sprites,
-                         output_file=args.output)
-    elif is_video(args.media):
-        video_processing(video_name=args.media,
-                         resolution=resolution,
-                         high_contrast=args.contrast,
-                         sprites=sprites,
-                         output_file=args.output)
-    else:
+    # A entrada é aberta uma única vez; o MediaInfo segue para o planner e para a conversão
+    info = probe_media(args.media)
+    if info == None:
         print("Invalid media format!")
         exit()
 
+    max_memory = args.max_memory * 1024 * 1024 if args.max_memory else None
+    plan = plan_job(info, resolution, args.workers, args.chunk_size, max_memory,
+                    args.streaming, args.shared_memory, args.tiled, args.strip_height)
+    if args.dry_run is not None:
+        print(plan)
+        if args.dry_run:
+            with open(args.dry_run, "w") as file:
+                json.dump(plan.as_dict(), file, indent=1)
+        exit()
+
+    if args.profile is not None:
+        profile_start = start_profile()
+
+    stats = None
+    try:
+        if plan.mode == "tiled":
+            stats = tiled_image(image_name=args.media,
+                                output_file=args.output,
+                                atlas=atlas,
+                                palette=palette,
+                                resolution=resolution,
+                                high_contrast=args.contrast,
+                                strip_height=args.strip_height,
+                                workers=args.workers,
+                                max_memory=max_memory,
+                                sampling=args.sampling)
+        elif info.kind == "grid":
+            export_grid(args.media, args.output, atlas, palette)
+        elif info.kind == "gif":
+            stats = gif_processing(gif_name=args.media,
+                                   resolution=resolution,
+                                   high_contrast=args.contrast,
+                                   atlas=atlas,
+                                   palette=palette,
+                                   output_file=args.output,
+                                   sampling=args.sampling,
+                                   workers=args.workers,
+                                   max_memory=max_memory)
+        elif info.kind == "image":
+            image_processing(image_name=args.media,
+                             resolution=resolution,
+                             high_contrast=args.contrast,
+                             atlas=atlas,
+                             palette=palette,
+                             output_file=args.output,
+                             sampling=args.sampling)
+        else:
+            stats = video_processing(video_name=args.media,
+                                     resolution=resolution,
+                                     high_contrast=args.contrast,
+                                     atlas=atlas,
+                                     palette=palette,
+                                     output_file=args.output,
+                                     sampling=args.sampling,
+                                     streaming=args.streaming,
+                                     chunk_size=args.chunk_size,
+                                     workers=args.workers,
+                                     shared_memory=args.shared_memory,
+                                     max_memory=max_memory,
+                                     info=info)
+    except Image.DecompressionBombError as error:
+        print(f"[ DecompressionBombError ] {error} Use --tiled to convert it anyway (it will be decoded whole).")
+        exit()
+    except ValueError as error:
+        print(f"[ ValueError ] {error}")
+        exit()
+
+    if stats != None:
+        print(stats)
+
+    if args.profile is not None:
+        print(finish_profile(args.profile or default_output("PyASCII_profile.json"), profile_start))
+
     end_time = time()
     execution_time = end_time - start_time
     print(f"Execution time: {execution_time} seconds")
@@ -1,319 +1,146 @@
 #!/usr/bin/env python3
 
-from PIL import Image, ImageOps
-from moviepy.editor import VideoFileClip, concatenate_videoclips
 from time import time
-from multiprocessing import Process
-from threading import Thread
-import numpy as np
-import cv2
+from PIL import Image
+import threading
+import queue
+import io
 import os
-import re
-import tomllib
+from pyascii_core.processing import image_processing, gif_processing, video_processing
+from pyascii_core.renderer import scaled_size, grid_size, gray_image, cells_to_indices, render_indices
+from pyascii_core.sprites import load_filters, load_sprites, palette_image
+from pyascii_core.grid_format import is_grid_file, export_grid
+from pyascii_core.progress import Cancelled, set_progress_hook
+from pyascii_core.tiled import open_unbounded, tiled_image
+from pyascii_core.probe import probe_media
+from pyascii_core.planner import plan_job
+from pyascii_core.paths import OUTPUT_DIR
 import tkinter as tk
+from tkinter import ttk
 from tkinter import filedialog
 from tkinter import messagebox
 
-sprite_height = 8
-sprite_width = 8
-
-if (not os.path.exists('PyASCII/output')):
-    os.makedirs('PyASCII/output')
-if (not os.path.exists('PyASCII/temp')):
-    os.makedirs('PyASCII/temp')
-else:
-    for file in os.listdir("PyASCII/temp"):
-        file_path = os.path.join("PyASCII/temp", file)
-        if os.path.isfile(file_path):
-            os.remove(file_path)
-
-def load_filters():
-    with open('filters.toml', 'rb') as file:
-        filters = tomllib.load(file)
-    return filters
-
-#### Image Tools ####
-
-# Muda a resolução da imagem sem perder a proporção
-def resize_image(image, ref_size):
-    rows, cols = image.size
-    if rows < cols:
-        cols = int((cols / rows) * ref_size)
-        rows = ref_size
-    elif rows == cols:
-        cols = ref_size
-        rows = ref_size
-    else:
-        rows = int((rows / cols) * ref_size)
-        cols = ref_size
-    return image.resize((rows, cols), Image.LANCZOS)
-
-# Transformar o valor do pixel de 0 a 255 em 0 a 16
-def pixel_value_to_index(pixel_value):
-    return int((pixel_value / 255) * 16)
-
-def image_processing(image_name, resolution, high_contrast, sprites, output_file):
-    image = Image.open(image_name).convert("L")
-    image = resize_image(image, resolution)
-    if high_contrast:
-        image = ImageOps.equalize(image)
-    output_width, output_height = image.size
-
-    output_image = Image.new("RGB", (output_width, output_height))
-    for y in range(0, output_height, sprite_height):
-        for x in range(0, output_width, sprite_width):
-            pixel_value = image.getpixel((x, y))
-            index = pixel_value_to_index(pixel_value)
-            sprite = sprites[index]
-            output_image.paste(sprite, (x, y))
-
-    # Salva a imagem final como png
-    if output_file != None:
-        output_image.save(f"{output_file}")
-    else:
-        output_image.save("./PyASCII/output/PyAscii_image.png")
-
-##### GIF Tools #####
-
-def gif_processing(gif_name, resolution, high_contrast, sprites, output_file):
-    gif = Image.open(gif_name)
-    frames = []
-    durations = []
-
-    for frame in range(0, gif.n_frames):
-        gif.seek(frame)
-        image = gif.convert("L")
-        image = resize_image(image, resolution)
-        if high_contrast:
-            image = ImageOps.equalize(image)
-
-        output_width, output_height = image.size
-        output_image = Image.new("RGB", (output_width, output_height))
-        for y in range(0, output_height, sprite_height):
-            for x in range(0, output_width, sprite_width):
-                pixel_value = image.getpixel((x, y))
-                index = pixel_value_to_index(pixel_value)
-                sprite = sprites[index]
-                output_image.paste(sprite, (x, y))
-
-        frames.append(output_image)
-        durations.append(gif.info['duration'])
-
-    if output_file != None:
-        frames[0].save(output_file, save_all=True, append_images=frames[1:], duration=durations, loop=0)
-    else:
-        frames[0].save("./PyASCII/output/PyAscii_gif.gif", save_all=True, append_images=frames[1:], duration=durations, loop=0)
-
-
-##### Video Tools #####
-
-def extrair_frames(input_video_path):
-    cap = cv2.VideoCapture(input_video_path)
-    frames = []
-    
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        frames.append(frame)
-    
-    cap.release()
-    return frames
-
-# Função para salvar frames como um novo vídeo
-def salvar_frames(frames, output_path, fps):
-    height, width, layers = frames[0].shape
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v') # ou 'XVID' para .avi
-    video = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-    
-    for frame in frames:
-        video.write(frame)
-    
-    video.release()
-
-def load_sprites(sprite_sheet_image, sprite_width, sprite_height, monochrome_filter):
-    # Função para obter um sprite individual
-    def get_sprite(x, y):
-        sprite = sprite_sheet_image.crop((x, y, x + sprite_width, y + sprite_height))
-        return sprite
-    
-    sheet_width, sheet_height = sprite_sheet_image.size
-    filters = load_filters()
-    
-    if (monochrome_filter != "None"):
-        if monochrome_filter not in filters:
-            print(f"[ KeyError ] '{monochrome_filter}' is not recognized as a filter!")
-            exit()
-
-        for y in range(0, sheet_height):
-            for x in range(0, sheet_width):
-                pixel_value = sprite_sheet_image.getpixel((x, y))
-                if pixel_value == (255, 255, 255, 255):
-                    sprite_sheet_image.putpixel((x, y), tuple(filters[monochrome_filter][0]))
-                else:
-                    sprite_sheet_image.putpixel((x, y), tuple(filters[monochrome_filter][1]))
-    
-    sprites = []
-    for y in range(0, sprite_sheet_image.height, sprite_height):
-        for x in range(0, sprite_sheet_image.width, sprite_width):
-            sprite = get_sprite(x, y)
-            sprites.append(sprite)
-
-    return sprites
-
-# Função para processar cada subclipe
-def process_subclip(sprites, subclip, ct, ref, high_contrast):
-    frames = extrair_frames(subclip)
-    fps = cv2.VideoCapture(subclip).get(cv2.CAP_PROP_FPS)
-
-    for i in range(len(frames)):
-        # Carregar a imagem em escala de cinza
-        image = Image.fromarray(cv2.cvtColor(frames[i], cv2.COLOR_BGR2RGB)).convert("L")
-        image = resize_image(image, ref)
-        if high_contrast:
-            image = ImageOps.equalize(image) # Equaliza a imagem (aumenta contraste)
-        output_width, output_height = image.size
-
-        output_image = Image.new("RGB", (output_width, output_height))
-        for y in range(0, output_height, sprite_height):
-            for x in range(0, output_width, sprite_width):
-                pixel_value = image.getpixel((x, y))
-                index = pixel_value_to_index(pixel_value)
-                sprite = sprites[index]
-                output_image.paste(sprite, (x, y))
-
-        frames[i] = cv2.cvtColor(np.array(output_image), cv2.COLOR_RGB2BGR)
-
-    os.remove(f"./PyASCII/temp/subclip_{ct}.mp4") # Deleta subclipe antigo
-
-    height, width, layers = frames[0].shape
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v') # ou 'XVID' para .avi
-    video = cv2.VideoWriter(f"./PyASCII/temp/processed_subclip{ct}.mp4", fourcc, fps, (width, height))
-    
-    for frame in frames:
-        video.write(frame)
-    
-    video.release()
-
-def get_numeric_part(filename):
-    # Extrai a parte numérica do nome do arquivo
-    match = re.search(r'\d+', filename)
-    return int(match.group()) if match else float('inf')
-
-def video_processing(video_name, resolution, high_contrast, sprites, output_file):
-    video = VideoFileClip(filename=video_name, audio=False)
-    ref = resolution
-
-    time_frag = 5  # Tempo em segundos de cada subclipe
-
-    index = 0
-    start = 0
-    qtd_procs = 0    # Variável utilizada para mensurar a quantidade de processos simultâneos, Não deve ultrapassar os.cpu_count()!!!
-    ct = 0           # Contador de subclipe
-    frag_counter = 0 # Variável para representar o frag{}.mp4 (conjunto de subclipes)
-    while(True):
-        while(qtd_procs < (os.cpu_count() - 1)):
-            if start + time_frag >= video.duration:
-                end = video.duration
-                clip = video.subclip(start, end)
-                clip.write_videofile(f"./PyASCII/temp/subclip_{index}.mp4")
-                break
-            else:
-                end = start + time_frag
-                clip = video.subclip(start, end)
-                clip.write_videofile(f"./PyASCII/temp/subclip_{index}.mp4")
-                start += time_frag
-            index += 1
-            qtd_procs += 1
-        
-        files = sorted([os.path.join("PyASCII/temp", f) for f in os.listdir("PyASCII/temp") if f.startswith('subclip')], key=get_numeric_part)
-        procs = []
-        
-        for subclip in files:
-            if os.name == "nt": # Windows (Existe um bug envolvendo a leitura dos arquivos temporários quando Process() é utilizado no Windows, então foi necessário o uso de Thread())
-                proc = Thread(target=process_subclip, args=(sprites, subclip, ct, ref, high_contrast))
-            elif os.name == "posix": # Linux
-                proc = Process(target=process_subclip, args=(sprites, subclip, ct, ref, high_contrast))
-            procs.append(proc)
-            proc.start()
-            ct += 1
-
-        for proc in procs:
-            proc.join()  
-
-        files = [os.path.join("PyASCII/temp", f) for f in os.listdir("PyASCII/temp") if f.startswith('processed_subclip')]
-        clips = [VideoFileClip(f) for f in sorted(files, key=get_numeric_part)]
-        final_clip = concatenate_videoclips(clips)
-        final_clip.write_videofile(f'./PyASCII/temp/frag{frag_counter}.mp4', codec='libx264')
-        frag_counter += 1
-
-        for file in files:
-            os.remove(file) # Remove os subclipes temporários
-
-        if end == video.duration:
-            break
-
-        qtd_procs = 0
-    video.close()
-
-    # Une subclipes em um único clipe (sem áudio)
-    files = [os.path.join("PyASCII/temp", f) for f in os.listdir("PyASCII/temp") if f.startswith('frag')]
-    clips = [VideoFileClip(f) for f in sorted(files, key=get_numeric_part)]
-    final_clip = concatenate_videoclips(clips)
-    if output_file == None:
-        output_video_path = './PyASCII/output/PyASCII_noaudio.mp4'
-    else:
-        output_video_path = f"{output_file}_NoAudio.mp4"
-    final_clip.write_videofile(output_video_path, codec='libx264')
-
-    files = [os.path.join("PyASCII/temp", f) for f in os.listdir("PyASCII/temp") if os.path.isfile(os.path.join("PyASCII/temp", f))]
-    for file in files:
-        os.remove(file) # Remove os subclipes temporários
-
-    input_video_path = video_name
-    video_clip = VideoFileClip(input_video_path)
-    audio_clip = video_clip.audio
-    final_video = VideoFileClip(output_video_path)
-    final_video_with_audio = final_video.set_audio(audio_clip)
-    if output_file == None:
-        final_output_path = './PyASCII/output/PyASCII.mp4'
-    else:
-        final_output_path = output_file
-    final_video_with_audio.write_videofile(final_output_path, codec='libx264', audio_codec='aac')
-
-
-def is_image(file_path):
+# A conversão roda em uma thread separada, então a janela continua respondendo. A thread manda
+# o progresso para a janela por uma fila, lida a cada POLL_MS; o botão Cancel faz o hook de
+# progresso levantar Cancelled no próximo frame gravado.
+# A prévia usa um frame da mídia já em escala de cinza e reduzido, carregado em uma thread ao
+# escolher o arquivo, e é refeita PREVIEW_DELAY_MS depois da última mudança de resolução, filtro
+# ou contraste.
+POLL_MS = 100
+PREVIEW_DELAY_MS = 150
+PREVIEW_SOURCE = 1024 # Lado maior do frame guardado para a prévia
+PREVIEW_SIZE = (360, 360)
+PREVIEW_MAX_PIXELS = 50_000_000 # Acima disso só JPEGs (decodificados já reduzidos) têm prévia
+
+#### Preview ####
+preview_source = None # (frame em escala de cinza reduzido, tamanho original da mídia)
+preview_job = None
+preview_photo = None
+preview_loads = queue.Queue() # (caminho, fonte da prévia) de cada carregamento em segundo plano
+preview_renders = queue.Queue() # (número da prévia, imagem) de cada prévia renderizada em segundo plano
+preview_number = 0
+
+# Um frame representativo da mídia: a imagem, o primeiro frame do GIF ou um frame a 10% do vídeo
+def load_preview_source(path):
     try:
-        with Image.open(file_path) as img:
-            img.verify()
-        return True
-    except (IOError, SyntaxError):
-        return False
-
-def is_video(file_path):
+        if is_grid_file(path):
+            return None
+        try:
+            image = open_unbounded(path) # Imagens enormes também, sem o limite de pixels do Pillow
+        except (IOError, SyntaxError):
+            image = None
+        if image is not None:
+            with image:
+                size = image.size
+                if image.format != "JPEG" and image.width * image.height > PREVIEW_MAX_PIXELS:
+                    return None # Teria que ser decodificada inteira
+                image.draft("L", (PREVIEW_SOURCE, PREVIEW_SOURCE)) # JPEGs já decodificados reduzidos
+                frame = image.convert("L")
+        else:
+            import cv2
+            cap = cv2.VideoCapture(path)
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) // 10)
+            ret, pixels = cap.read()
+            cap.release()
+            if not ret:
+                return None
+            frame = gray_image(pixels)
+            size = frame.size
+    except Exception:
+        return None
+    frame.thumbnail((PREVIEW_SOURCE, PREVIEW_SOURCE), Image.BOX)
+    return frame, size
+
+def load_preview_worker(path):
+    preview_loads.put((path, load_preview_source(path)))
+
+# Cada carregamento tem a sua espera, que termina ao receber um resultado; resultados de um arquivo
+# que já não é o escolhido são descartados
+def poll_preview():
+    global preview_source
     try:
-        video = cv2.VideoCapture(file_path)
-        if video.isOpened():
-            return True
-        return False
-    except Exception as e:
-        return False
-    finally:
-        video.release()
-
-def is_gif(file_path):
+        path, source = preview_loads.get_nowait()
+    except queue.Empty:
+        root.after(POLL_MS, poll_preview)
+        return
+    if path == file_path:
+        preview_source = source
+        schedule_preview()
+
+def schedule_preview(*_):
+    global preview_job
+    if preview_job is not None:
+        root.after_cancel(preview_job)
+    preview_job = root.after(PREVIEW_DELAY_MS, render_preview)
+
+# Mesmo caminho da conversão (grade de células, contraste, atlas e paleta), mas a partir do frame
+# guardado; o resultado é reduzido para caber no painel. Em resoluções altas a renderização leva
+# centenas de ms, então ela roda em uma thread e só a PhotoImage é criada na thread da janela.
+def preview_image(source, resolution, filter_name, high_contrast):
+    frame, source_size = source
+    atlas, _, palette = load_sprites(filter_name)
+    _, sprite_height, sprite_width = atlas.shape
+    output_size = scaled_size(source_size, resolution)
+    cells = frame.resize(grid_size(output_size, sprite_width, sprite_height), Image.BOX)
+    preview = palette_image(render_indices(cells_to_indices(cells, high_contrast), atlas, output_size), palette).convert("RGB")
+    preview.thumbnail(PREVIEW_SIZE, Image.BOX)
+    return preview
+
+def render_preview_worker(number, *settings):
+    preview_renders.put((number, preview_image(*settings)))
+
+def render_preview():
+    global preview_job, preview_number
+    preview_job = None
+    preview_number += 1 # Prévias ainda em andamento ficam desatualizadas
+    if preview_source is None or not int(entry.get() or 0):
+        preview_label.config(image="", text="No preview")
+        return
+    settings = (preview_source, int(entry.get()), selected_option.get(), contrast_var.get())
+    threading.Thread(target=render_preview_worker, args=(preview_number,) + settings, daemon=True).start()
+    root.after(POLL_MS, poll_render)
+
+# Como no poll_preview, cada prévia tem a sua espera; só a prévia mais recente é mostrada
+def poll_render():
+    global preview_photo
     try:
-        with Image.open(file_path) as img:
-            if img.format == 'GIF':
-                return True
-        return False
-    except (IOError, SyntaxError):
-        return False
+        number, preview = preview_renders.get_nowait()
+    except queue.Empty:
+        root.after(POLL_MS, poll_render)
+        return
+    if number != preview_number:
+        return
+
+    # O Tk lê PPM direto, sem precisar do ImageTk
+    data = io.BytesIO()
+    preview.save(data, "PPM")
+    preview_photo = tk.PhotoImage(data=data.getvalue())
+    preview_label.config(image=preview_photo, text="")
 
 #### GUI ####
 file_path = ""
 def select_file():
-    global file_path
+    global file_path, preview_source
     # Abrindo a janela para selecionar o arquivo
     file_path = filedialog.askopenfilename(title="Selecione um arquivo")
     
@@ -321,6 +148,10 @@ def select_file():
         try:
             # Atualiza o Label com o caminho do arquivo selecionado
             path_label.config(text=file_path)
+            preview_source = None
+            preview_label.config(image="", text="Loading preview...")
+            threading.Thread(target=load_preview_worker, args=(file_path,), daemon=True).start()
+            root.after(POLL_MS, poll_preview)
         
         except Exception as e:
             # Exibindo uma mensagem de erro
@@ -335,55 +166,138 @@ def validate_numeric_input(P):
     else:
         return False
     
-def on_go():
-    start_time = time()
+#### Conversion ####
+job = None # (thread, evento de cancelamento, fila de mensagens) da conversão em andamento
 
-    resolution = int(entry.get())
-    filt = selected_option.get()
-    contrast = contrast_var.get()
+# Roda na thread da conversão; a janela só é atualizada pela thread principal, a partir da fila
+def convert(path, resolution, filt, contrast, events, cancel):
+    def progress(done, total):
+        if cancel.is_set():
+            raise Cancelled()
+        events.put(("progress", done, total))
 
+    start_time = time()
+    set_progress_hook(progress)
     try:
-        sprite_sheet_image = Image.open("./sprite_sheet.png")
-        sprite_height = 8
-        sprite_width = 8
-        sprites = load_sprites(sprite_sheet_image, sprite_width, sprite_height, filt)
+        atlas, colors, palette = load_sprites(filt)
+        info = probe_media(path)
+        if info == None:
+            events.put(("error", "Invalid media format!"))
+            return
+        if info.kind == "grid":
+            export_grid(path, None, atlas, palette)
+        elif plan_job(info, resolution).mode == "tiled":
+            # Imagens grandes demais para o Pillow são convertidas faixa por faixa
+            tiled_image(path, None, atlas, palette, resolution, contrast)
+        elif info.kind == "gif":
+            gif_processing(gif_name=path,
+                           resolution=resolution,
+                           high_contrast=contrast,
+                           atlas=atlas,
+                           palette=palette,
+                           output_file=None)
+        elif info.kind == "image":
+            image_processing(image_name=path,
+                            resolution=resolution,
+                            high_contrast=contrast,
+                            atlas=atlas,
+                            palette=palette,
+                            output_file=None)
+        else:
+            video_processing(video_name=path,
+                            resolution=resolution,
+                            high_contrast=contrast,
+                            atlas=atlas,
+                            palette=palette,
+                            output_file=None,
+                            info=info)
+        events.put(("done", time() - start_time))
+    except Cancelled:
+        events.put(("cancelled",))
     except FileNotFoundError:
-        print("[ FileNotFoundError ] Sprite Sheet not found!")
-
-    if is_gif(file_path):
-        gif_processing(gif_name=file_path,
-                       resolution=resolution,
-                       high_contrast=contrast,
-                       sprites=sprites,
-                       output_file=None)
-    elif is_image(file_path):
-        image_processing(image_name=file_path,
-                        resolution=resolution,
-                        high_contrast=contrast,
-                        sprites=sprites,
-                        output_file=None)
-    elif is_video(file_path):
-        video_processing(video_name=file_path,
-                        resolution=resolution,
-                        high_contrast=contrast,
-                        sprites=sprites,
-                        output_file=None)
-    else:
-        print("Invalid media format!")
-        exit()
-
-    end_time = time()
-    execution_time = end_time - start_time
-    messagebox.showinfo(
-        "Success!",
-        f"The processed file is at {os.path.join(os.getcwd(), os.path.normpath('PyASCII/output/'))}\n"
-        f"Execution time: {round(execution_time, ndigits=2)} seconds"
-    )
-    
+        events.put(("error", "Sprite Sheet not found!"))
+    except Exception as e:
+        events.put(("error", f"Ocorreu um erro ao processar o arquivo: {e}"))
+    finally:
+        set_progress_hook(None)
+
+def on_go():
+    global job
+    if not file_path or not entry.get():
+        messagebox.showwarning("Aviso", "Selecione um arquivo e a resolução.")
+        return
+
+    events = queue.Queue()
+    cancel = threading.Event()
+    thread = threading.Thread(target=convert, args=(file_path, int(entry.get()), selected_option.get(), contrast_var.get(), events, cancel), daemon=True)
+    job = (thread, cancel, events)
+
+    btn_go.config(state="disabled")
+    btn_cancel.config(state="normal")
+    progress_bar.config(mode="indeterminate", value=0)
+    progress_bar.start()
+    status_label.config(text="Converting...")
+    thread.start()
+    root.after(POLL_MS, poll_job)
+
+def on_cancel():
+    if job is not None:
+        job[1].set()
+        status_label.config(text="Cancelling...")
+
+def finish_job():
+    global job
+    job = None
+    progress_bar.stop()
+    btn_go.config(state="normal")
+    btn_cancel.config(state="disabled")
+
+# Lê as mensagens da thread da conversão
+def poll_job():
+    _, _, events = job
+    while True:
+        try:
+            event = events.get_nowait()
+        except queue.Empty:
+            root.after(POLL_MS, poll_job)
+            return
+
+        if event[0] == "progress":
+            _, done, total = event
+            if total:
+                if str(progress_bar.cget("mode")) != "determinate":
+                    progress_bar.stop()
+                    progress_bar.config(mode="determinate", maximum=total)
+                progress_bar.config(value=done)
+                status_label.config(text=f"Converting... {done}/{total}")
+            continue
+
+        finish_job()
+        if event[0] == "done":
+            progress_bar.config(mode="determinate", value=progress_bar.cget("maximum"))
+            status_label.config(text=f"Done in {round(event[1], ndigits=2)} seconds")
+            messagebox.showinfo(
+                "Success!",
+                f"The processed file is at {os.path.join(os.getcwd(), os.path.normpath(OUTPUT_DIR))}\n"
+                f"Execution time: {round(event[1], ndigits=2)} seconds"
+            )
+        elif event[0] == "cancelled":
+            progress_bar.config(value=0)
+            status_label.config(text="Cancelled")
+        else:
+            progress_bar.config(value=0)
+            status_label.config(text="Failed")
+            messagebox.showerror("Erro", event[1])
+        return
+
+def on_close():
+    on_cancel()
+    root.destroy()
+
 if __name__ == "__main__":
     root = tk.Tk()
     root.title("PyASCII")
-    root.geometry("261x361")
+    root.geometry("660x420")
 
     # Frame para alinhar os widgets à esquerda
     left_frame = tk.Frame(root)
@@ -402,7 +316,8 @@ if __name__ == "__main__":
     resolution_label = tk.Label(left_frame, text="Resolution", font=("Helvetica", 10, "bold"))
     resolution_label.grid(row=2, column=0, padx=10, pady=(5, 0), sticky='w')
 
-    entry = tk.Entry(left_frame, validate='key', validatecommand=(root.register(validate_numeric_input), '%P'))
+    resolution_var = tk.StringVar(root, value="720")
+    entry = tk.Entry(left_frame, textvariable=resolution_var, validate='key', validatecommand=(root.register(validate_numeric_input), '%P'))
     entry.grid(row=3, column=0, padx=10, pady=5, sticky='w')
 
     filters_label = tk.Label(left_frame, text="Filters", font=("Helvetica", 10, "bold"))
@@ -419,10 +334,34 @@ if __name__ == "__main__":
     contrast_check = tk.Checkbutton(left_frame, text="High Contrast", variable=contrast_var)
     contrast_check.grid(row=6, column=0, padx=10, pady=5, sticky='w')
 
-    btn_go = tk.Button(left_frame, text="Go!", command=on_go)
-    btn_go.grid(row=7, column=0, padx=10, pady=20)
+    buttons_frame = tk.Frame(left_frame)
+    buttons_frame.grid(row=7, column=0, padx=10, pady=(20, 5))
+    btn_go = tk.Button(buttons_frame, text="Go!", command=on_go)
+    btn_go.grid(row=0, column=0, padx=5)
+    btn_cancel = tk.Button(buttons_frame, text="Cancel", command=on_cancel, state="disabled")
+    btn_cancel.grid(row=0, column=1, padx=5)
+
+    progress_bar = ttk.Progressbar(left_frame, length=200)
+    progress_bar.grid(row=8, column=0, padx=10, pady=5)
+
+    status_label = tk.Label(left_frame, text="")
+    status_label.grid(row=9, column=0, padx=10, pady=5)
 
     left_frame.grid_rowconfigure(7, weight=1)  # Permite que a linha do botão expanda
     left_frame.grid_columnconfigure(0, weight=1)  # Permite que a coluna do botão expanda
 
+    # Prévia à direita, refeita a cada mudança de resolução, filtro ou contraste
+    preview_frame = tk.Frame(root, width=PREVIEW_SIZE[0], height=PREVIEW_SIZE[1])
+    preview_frame.grid(row=0, column=1, padx=10, pady=10)
+    preview_frame.grid_propagate(False)  # O tamanho do painel não muda com a imagem
+    preview_frame.grid_rowconfigure(0, weight=1)
+    preview_frame.grid_columnconfigure(0, weight=1)
+    preview_label = tk.Label(preview_frame, text="No preview")
+    preview_label.grid(row=0, column=0)
+    resolution_var.trace_add("write", schedule_preview)
+    selected_option.trace_add("write", schedule_preview)
+    contrast_var.trace_add("write", schedule_preview)
+
+    root.protocol("WM_DELETE_WINDOW", on_close)
+
     root.mainloop()    
@@ -0,0 +1,17 @@
+"""PyASCII: converts images, GIFs and videos into ASCII art.
+
+    import pyascii_core
+    frame = pyascii_core.convert_image("cat.png", resolution=480)      # RGB array
+    pyascii_core.convert_video("cat.mp4", "cat_ascii.mp4", monochrome_filter="Brat")
+
+The API is loaded on first use, so importing the package does not load numpy,
+OpenCV or moviepy, and never touches the filesystem.
+"""
+
+__all__ = ["convert_image", "convert_gif", "convert_video"]
+
+def __getattr__(name):
+    if name in __all__:
+        from . import api
+        return getattr(api, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
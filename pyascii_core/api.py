@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+from PIL import Image
+import numpy as np
+import os
+from .renderer import render_frame, IncrementalRenderer
+from .sprites import load_sprites, apply_palette, palette_image
+from .processing import image_processing, gif_processing, video_processing
+from .paths import default_output
+
+##### Library API #####
+# Sem output_file, imagens e GIFs são devolvidos como arrays RGB (altura, largura, 3);
+# com output_file, o resultado é salvo e o caminho é devolvido.
+# Um output_file terminado em .pyascii guarda somente as grades de caracteres.
+# high_contrast aceita True (modo "scene") ou um dos modos de renderer.CONTRAST_MODES.
+
+# Aceita um caminho, uma imagem PIL ou um array (escala de cinza ou RGB)
+def open_image(image):
+    if isinstance(image, Image.Image):
+        return image.convert("L")
+    if isinstance(image, np.ndarray):
+        return Image.fromarray(image).convert("L")
+    return Image.open(image).convert("L")
+
+def convert_image(image, output_file=None, resolution=720, high_contrast=False, monochrome_filter=None, sampling="area"):
+    atlas, _, palette = load_sprites(monochrome_filter)
+    if isinstance(image, (str, os.PathLike)) and output_file != None:
+        image_processing(os.fspath(image), resolution, high_contrast, atlas, palette, os.fspath(output_file), sampling)
+        return output_file
+
+    frame = render_frame(open_image(image), atlas, resolution, high_contrast, sampling)
+    if output_file == None:
+        return apply_palette(frame, palette)
+    palette_image(frame, palette).save(output_file)
+    return output_file
+
+def convert_gif(gif, output_file=None, resolution=720, high_contrast=False, monochrome_filter=None, sampling="area", workers=None, max_memory=None):
+    atlas, _, palette = load_sprites(monochrome_filter)
+    if output_file != None:
+        gif_processing(os.fspath(gif), resolution, high_contrast, atlas, palette, os.fspath(output_file), sampling, workers, max_memory)
+        return output_file
+
+    frames = []
+    renderer = IncrementalRenderer(atlas)
+    with Image.open(gif) as source:
+        for frame in range(0, source.n_frames):
+            source.seek(frame)
+            frames.append(apply_palette(renderer.render_image(source.convert("L"), resolution, high_contrast, sampling), palette))
+    return frames
+
+# Vídeos sempre são gravados em arquivo (por padrão em ./PyASCII/output/PyASCII.mp4)
+def convert_video(video, output_file=None, resolution=720, high_contrast=False, monochrome_filter=None, sampling="area",
+                  streaming=False, chunk_size=None, workers=None, shared_memory=False, max_memory=None):
+    atlas, _, palette = load_sprites(monochrome_filter)
+    if output_file == None:
+        output_file = default_output("PyASCII.mp4")
+    video_processing(os.fspath(video), resolution, high_contrast, atlas, palette, os.fspath(output_file), sampling,
+                     streaming, chunk_size, workers, shared_memory, max_memory)
+    return output_file
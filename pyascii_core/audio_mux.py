@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+
+from moviepy.config import get_setting
+import subprocess
+
+##### Audio Mux #####
+# Junta o vídeo ASCII (já codificado) com o áudio original sem recodificar nenhum dos dois.
+
+def run_ffmpeg(args):
+    cmd = [get_setting("FFMPEG_BINARY"), "-y", "-loglevel", "error"] + args
+    return subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+# O mapeamento "1:a:0?" é opcional: se a fonte não tiver áudio o vídeo é apenas copiado
+def mux_audio(video_path, audio_source, output_path):
+    inputs = ["-i", video_path, "-i", audio_source, "-map", "0:v:0", "-map", "1:a:0?", "-c:v", "copy"]
+
+    result = run_ffmpeg(inputs + ["-c:a", "copy", output_path])
+    if result.returncode != 0:
+        # O codec de áudio original não cabe no container de saída, então somente o áudio é convertido
+        result = run_ffmpeg(inputs + ["-c:a", "aac", output_path])
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed to mux audio into '{output_path}': {result.stderr.decode(errors='replace').strip()}")
+
+# O ffmpeg lista as faixas do arquivo ao abri-lo sem saída (e termina com erro por não ter saída)
+def has_audio(path):
+    cmd = [get_setting("FFMPEG_BINARY"), "-hide_banner", "-i", path]
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    return any(b"Stream #" in line and b"Audio:" in line for line in result.stderr.splitlines())
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+
+from multiprocessing import Pool
+from time import perf_counter
+import numpy as np
+import glob
+import json
+import os
+from .processing import image_processing, gif_processing, video_processing
+from .probe import probe_media
+from .planner import plan_job
+from .sprites import load_sprites, file_signature
+from .paths import SPRITE_SHEET, FILTERS_FILE, OUTPUT_DIR, default_workers
+
+##### Batch Mode #####
+# Converte vários arquivos com um único pool de processos, que carrega o atlas uma vez só.
+# Os itens são ordenados pelo tempo estimado pelo planner, do maior para o menor, para que um
+# vídeo longo não fique por último segurando o lote. Cada processo converte um item inteiro;
+# vídeos usam o pipeline em streaming, já que o paralelismo vem de converter vários itens ao
+# mesmo tempo.
+
+OUTPUT_EXTENSIONS = {"image": ".png", "gif": ".gif", "video": ".mp4"}
+MANIFEST_EXTENSIONS = (".txt", ".list")
+STAMP_FILE = ".pyascii_batch.json" # Fonte e configuração de cada saída já convertida
+
+class BatchItem:
+    def __init__(self, source, relative_path, info, cost):
+        self.source = source
+        self.relative_path = relative_path # Caminho da saída dentro da pasta de saída, sem extensão
+        self.info = info
+        self.kind = info.kind
+        self.cost = cost # Segundos estimados
+        self.output = None
+
+class BatchReport:
+    def __init__(self):
+        self.converted = 0
+        self.up_to_date = 0
+        self.failed = []
+        self.unsupported = []
+        self.bytes = 0
+        self.elapsed = 0
+        self.latencies = {} # Tipo de mídia -> segundos por item
+
+    def __str__(self):
+        items_per_second = self.converted / self.elapsed if self.elapsed else 0
+        megabytes_per_second = self.bytes / (1024 * 1024) / self.elapsed if self.elapsed else 0
+        lines = [f"Batch: {self.converted} converted, {self.up_to_date} up to date, {len(self.failed)} failed, "
+                 f"{len(self.unsupported)} unsupported in {self.elapsed:.2f} seconds",
+                 f"Throughput: {items_per_second:.2f} items/s, {megabytes_per_second:.2f} MB/s"]
+        for kind, latencies in self.latencies.items():
+            latencies = np.array(latencies)
+            lines.append(f"{kind}: {len(latencies)} items, p50 {np.percentile(latencies, 50):.2f} s, "
+                         f"p95 {np.percentile(latencies, 95):.2f} s, max {latencies.max():.2f} s")
+        for source, error in self.failed:
+            lines.append(f"[ Failed ] {source}: {error}")
+        return "\n".join(lines)
+
+#### Input Discovery ####
+
+# Cada fonte pode ser uma pasta (lida recursivamente), um glob, um manifesto (.txt/.list com
+# um caminho por linha) ou um arquivo. Devolve pares (arquivo, caminho relativo da saída).
+def expand_sources(sources, output_dir):
+    output_dir = os.path.abspath(output_dir)
+    for source in sources:
+        if os.path.isdir(source):
+            for root, dirs, files in os.walk(source):
+                # Não entra em pastas ocultas nem na própria pasta de saída
+                dirs[:] = sorted(d for d in dirs if not d.startswith(".") and os.path.abspath(os.path.join(root, d)) != output_dir)
+                for file in sorted(files):
+                    path = os.path.join(root, file)
+                    yield path, os.path.relpath(path, source)
+        elif glob.has_magic(source):
+            for path in sorted(glob.glob(source, recursive=True)):
+                if os.path.isfile(path):
+                    yield path, os.path.basename(path)
+        elif source.lower().endswith(MANIFEST_EXTENSIONS):
+            base = os.path.dirname(source)
+            with open(source) as manifest:
+                lines = [line.strip() for line in manifest]
+            yield from expand_sources([os.path.join(base, line) for line in lines if line and not line.startswith("#")], output_dir)
+        else:
+            yield source, os.path.basename(source)
+
+# Identifica o tipo de mídia e estima o tempo da conversão como ela roda no lote (em um só processo)
+def probe_item(path, relative_path, resolution):
+    info = probe_media(path)
+    if info == None or info.kind not in OUTPUT_EXTENSIONS:
+        return None
+    plan = plan_job(info, resolution, workers=1, streaming=True)
+    return BatchItem(path, os.path.splitext(relative_path)[0], info, plan.seconds)
+
+#### Up-to-date Check ####
+
+def source_stamp(item, settings):
+    stat = os.stat(item.source)
+    return {"source": os.path.abspath(item.source), "mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "settings": settings}
+
+def load_stamps(output_dir):
+    try:
+        with open(os.path.join(output_dir, STAMP_FILE)) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+def save_stamps(output_dir, stamps):
+    path = os.path.join(output_dir, STAMP_FILE)
+    with open(f"{path}.tmp", "w") as file:
+        json.dump(stamps, file, indent=1)
+    os.replace(f"{path}.tmp", path)
+
+#### Workers ####
+
+batch_settings = {}
+
+# Cada processo carrega o atlas e a paleta uma única vez (o atlas vem do cache em disco)
+def init_batch_worker(monochrome_filter, resolution, high_contrast, sampling):
+    atlas, _, palette = load_sprites(monochrome_filter)
+    batch_settings.update(atlas=atlas, palette=palette, resolution=resolution, high_contrast=high_contrast, sampling=sampling)
+
+# Recebe (posição do item, MediaInfo, saída) e devolve (posição, segundos, erro ou None)
+def convert_item(task):
+    number, info, output = task
+    kind, source = info.kind, info.path
+    start = perf_counter()
+    try:
+        if kind == "image":
+            image_processing(source, output_file=output, **batch_settings)
+        elif kind == "gif":
+            gif_processing(source, output_file=output, workers=1, **batch_settings)
+        else:
+            video_processing(source, output_file=output, streaming=True, info=info, **batch_settings)
+        error = None
+    except Exception as exception:
+        error = str(exception) or type(exception).__name__
+    return number, perf_counter() - start, error
+
+#### Batch ####
+
+def run_batch(sources, output_dir, resolution, high_contrast, monochrome_filter=None, sampling="area", workers=None, force=False):
+    start = perf_counter()
+    load_sprites(monochrome_filter) # Um filtro inválido falha aqui, e não no initializer de cada processo
+    output_dir = output_dir or OUTPUT_DIR
+    report = BatchReport()
+    # A sprite sheet e os filtros (quando um filtro é usado) também definem a saída: editar um deles
+    # faz o lote converter tudo de novo
+    filters = file_signature(FILTERS_FILE) if monochrome_filter else None
+    settings = json.dumps([resolution, high_contrast, monochrome_filter, sampling, file_signature(SPRITE_SHEET), filters])
+    stamps = load_stamps(output_dir)
+
+    items = []
+    outputs = set()
+    for path, relative_path in expand_sources(sources, output_dir):
+        item = probe_item(path, relative_path, resolution)
+        if item is None:
+            report.unsupported.append(path)
+            continue
+        item.output = os.path.join(output_dir, item.relative_path + OUTPUT_EXTENSIONS[item.kind])
+        if item.output in outputs:
+            report.failed.append((path, f"another input is already written to {item.output}"))
+            continue
+        outputs.add(item.output)
+        if not force and os.path.exists(item.output) and stamps.get(item.output) == source_stamp(item, settings):
+            report.up_to_date += 1
+            continue
+        items.append(item)
+
+    # Os mais caros primeiro: com o pool sempre ocupado, o lote termina perto de custo total / processos
+    items.sort(key=lambda item: item.cost, reverse=True)
+    for item in items:
+        os.makedirs(os.path.dirname(item.output), exist_ok=True)
+
+    if items:
+        workers = min(workers or default_workers(), len(items))
+        with Pool(workers, initializer=init_batch_worker, initargs=(monochrome_filter, resolution, high_contrast, sampling)) as pool:
+            tasks = [(number, item.info, item.output) for number, item in enumerate(items)]
+            for number, seconds, error in pool.imap_unordered(convert_item, tasks):
+                item = items[number]
+                if error is not None:
+                    report.failed.append((item.source, error))
+                    stamps.pop(item.output, None)
+                else:
+                    report.converted += 1
+                    report.bytes += os.path.getsize(item.source)
+                    report.latencies.setdefault(item.kind, []).append(seconds)
+                    stamps[item.output] = source_stamp(item, settings)
+                # Gravados a cada item, para que um lote interrompido não converta de novo o que já terminou
+                save_stamps(output_dir, stamps)
+
+    report.elapsed = perf_counter() - start
+    return report
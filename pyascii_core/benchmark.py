@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+
+from PIL import Image
+from multiprocessing import get_context
+from contextlib import contextmanager
+from time import perf_counter
+import numpy as np
+import subprocess
+import platform
+import json
+import sys
+import io
+import os
+from .renderer import scaled_size, grid_size, gray_image, glyph_lut, render_indices, IncrementalRenderer, ContrastEqualizer
+from .sprites import load_sprites, apply_palette, palette_image
+from .gif_pipeline import changed_region, gif_palette, transparent_index
+from .gif_writer import GifWriter, encode_frame
+from .processing import image_processing, gif_processing, video_processing
+from .batch import OUTPUT_EXTENSIONS
+from .paths import PROJECT_DIR, default_output, scratch_job
+from .chunk_cache import CHUNK_CACHE_ENV
+
+##### Benchmark Suite #####
+# Gera imagens, GIFs e vídeos sintéticos (gradientes, ruído e formas em movimento) e mede:
+#   - cada etapa da conversão separadamente, chamando as mesmas funções dos pipelines em sequência
+#     (decodificação, escala de cinza, redução, contraste, glifos, composição, codificação e mux);
+#   - a conversão completa por image_processing / gif_processing / video_processing, em frames/s;
+#   - o pico de memória (RSS) de cada caso, que roda em um processo novo;
+#   - nos GIFs, o tempo e o tamanho de cada codificador de GIF com os mesmos frames;
+#   - o tempo de importação do pacote e dos módulos de conversão, em um interpretador novo.
+# O resultado é salvo em JSON; comparado com um JSON salvo antes (baseline), cada etapa mais
+# lenta do que a tolerância conta como uma regressão.
+
+BENCHMARK_VERSION = 1
+REGRESSION_TOLERANCE = 0.25 # Fração mais lenta (ou mais memória) aceita antes de contar como regressão
+MIN_SECONDS = 0.005 # Diferenças menores do que isso são ruído, mesmo acima da tolerância
+MIN_RSS_MB = 16
+IMPORT_RUNS = 5
+STAGE_RUNS = 3 # As etapas são medidas algumas vezes e fica o menor tempo de cada uma
+
+# (nome, tipo, largura, altura, frames, resolução de saída)
+CASES = [
+    ("image 640x360", "image", 640, 360, 1, 360),
+    ("image 1920x1080", "image", 1920, 1080, 1, 720),
+    ("image 3840x2160", "image", 3840, 2160, 1, 1080),
+    ("gif 320x240", "gif", 320, 240, 48, 240),
+    ("gif 640x480", "gif", 640, 480, 24, 480),
+    ("video 640x360", "video", 640, 360, 72, 360),
+    ("video 1280x720", "video", 1280, 720, 48, 720),
+]
+
+MEDIA_EXTENSIONS = {"image": ".jpg", "gif": ".gif", "video": ".mp4"}
+
+IMAGE_STAGES = ("decode", "grayscale", "resize", "equalize", "glyph mapping", "composition", "encode")
+VIDEO_STAGES = IMAGE_STAGES + ("mux",)
+
+IMPORTS = ("pyascii_core", "pyascii_core.processing", "pyascii_core.video_pipeline")
+
+#### Synthetic Media ####
+
+# Frame RGB determinístico: gradientes, ruído fixo e um círculo e um retângulo que se movem
+def synthetic_frame(width, height, number, seed=0):
+    y, x = np.mgrid[0:height, 0:width]
+    noise = np.random.default_rng(seed).integers(0, 48, (height, width), dtype=np.uint8)
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[..., 0] = x * 255 // max(1, width - 1)
+    frame[..., 1] = y * 255 // max(1, height - 1)
+    frame[..., 2] = (x + y + number * 4) % 256
+    frame = np.maximum(frame, noise[..., None])
+
+    radius = min(width, height) // 6
+    center_x = (number * width // 24 + width // 4) % width
+    center_y = height // 2
+    frame[(x - center_x) ** 2 + (y - center_y) ** 2 < radius ** 2] = (250, 240, 40)
+    left = (width - (number * width // 32) % width) % width
+    frame[height // 8:height // 8 + radius, left:left + radius] = (20, 20, 30)
+    return frame
+
+def make_still(path, width, height):
+    Image.fromarray(synthetic_frame(width, height, 0)).save(path, quality=90)
+
+def make_gif(path, width, height, frames):
+    images = [Image.fromarray(synthetic_frame(width, height, number)).convert("P", palette=Image.Palette.ADAPTIVE)
+              for number in range(frames)]
+    images[0].save(path, save_all=True, append_images=images[1:], duration=40, loop=0)
+
+# Vídeo H.264 com uma faixa de áudio (um tom), para que o mux também seja medido
+def make_video(path, width, height, frames, fps=24):
+    from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+    from .audio_mux import run_ffmpeg
+
+    silent_path = f"{path}_silent.mp4"
+    writer = FFMPEG_VideoWriter(silent_path, (width, height), fps, codec='libx264')
+    for number in range(frames):
+        writer.write_frame(synthetic_frame(width, height, number))
+    writer.close()
+    result = run_ffmpeg(["-i", silent_path, "-f", "lavfi", "-i", f"sine=frequency=440:duration={frames / fps}",
+                         "-c:v", "copy", "-c:a", "aac", "-shortest", path])
+    if result.returncode == 0:
+        os.remove(silent_path)
+    else:
+        os.replace(silent_path, path) # ffmpeg sem lavfi: o vídeo fica sem áudio
+
+def make_media(kind, path, width, height, frames):
+    if kind == "image":
+        make_still(path, width, height)
+    elif kind == "gif":
+        make_gif(path, width, height, frames)
+    else:
+        make_video(path, width, height, frames)
+
+#### Stage Timing ####
+
+class StageTimes:
+    def __init__(self, stages):
+        self.seconds = dict.fromkeys(stages, 0.0)
+
+    @contextmanager
+    def stage(self, name):
+        start = perf_counter()
+        yield
+        self.seconds[name] += perf_counter() - start
+
+# Pico de RSS deste processo e dos processos filhos já encerrados, em MB (None sem o módulo resource).
+# No Linux o ru_maxrss do próprio processo inclui a memória do processo pai antes do exec, então
+# o pico vem do VmHWM, que é só deste processo.
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    try:
+        with open("/proc/self/status") as status:
+            peak = next(int(line.split()[1]) for line in status if line.startswith("VmHWM:"))
+    except (OSError, StopIteration):
+        pass
+    peak = max(peak, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024 # Bytes no macOS, KB no Linux
+
+def cell_grid(times, image, resolution, sprite_width, sprite_height):
+    output_size = scaled_size(image.size, resolution)
+    with times.stage("resize"):
+        cells = np.asarray(image.resize(grid_size(output_size, sprite_width, sprite_height), Image.BOX))
+    return cells, output_size
+
+def grid_to_indices(times, cells, equalizer):
+    with times.stage("equalize"):
+        lut = glyph_lut(cells, True, equalizer)
+    with times.stage("glyph mapping"):
+        return lut[cells]
+
+def image_stages(path, resolution, atlas, palette):
+    _, sprite_height, sprite_width = atlas.shape
+    times = StageTimes(IMAGE_STAGES)
+    with times.stage("decode"):
+        image = Image.open(path)
+        image.load()
+    with times.stage("grayscale"):
+        image = image.convert("L")
+    cells, output_size = cell_grid(times, image, resolution, sprite_width, sprite_height)
+    indices = grid_to_indices(times, cells, ContrastEqualizer())
+    with times.stage("composition"):
+        canvas = render_indices(indices, atlas, output_size)
+    with times.stage("encode"):
+        palette_image(canvas, palette).save(io.BytesIO(), "PNG")
+    return times.seconds
+
+def gif_stages(path, resolution, atlas, palette):
+    _, sprite_height, sprite_width = atlas.shape
+    times = StageTimes(IMAGE_STAGES)
+    renderer = IncrementalRenderer(atlas)
+    equalizer = ContrastEqualizer()
+    transparency, colors = transparent_index(palette), gif_palette(palette)
+    gif = Image.open(path)
+    previous_disposal = None
+    for number in range(gif.n_frames):
+        with times.stage("decode"):
+            gif.seek(number)
+            gif.load()
+        with times.stage("grayscale"):
+            image = gif.convert("L")
+        cells, output_size = cell_grid(times, image, resolution, sprite_width, sprite_height)
+        indices = grid_to_indices(times, cells, equalizer)
+        with times.stage("composition"):
+            canvas = renderer.render(indices, output_size)
+        with times.stage("encode"):
+            region, offset = changed_region(canvas, renderer, previous_disposal, transparency)
+            encode_frame(palette_image(region, colors), gif.info.get("duration", 0), gif.disposal_method,
+                         offset=offset, transparency=transparency)
+        previous_disposal = gif.disposal_method
+    return times.seconds
+
+def video_stages(path, resolution, atlas, palette, scratch):
+    import cv2
+    from .video_pipeline import write_frames
+    from .audio_mux import mux_audio
+
+    _, sprite_height, sprite_width = atlas.shape
+    times = StageTimes(VIDEO_STAGES)
+    renderer = IncrementalRenderer(atlas)
+    equalizer = ContrastEqualizer()
+    cap = cv2.VideoCapture(path)
+
+    def frames():
+        while True:
+            with times.stage("decode"):
+                ret, frame = cap.read()
+            if not ret:
+                break
+            with times.stage("grayscale"):
+                image = gray_image(frame)
+            cells, output_size = cell_grid(times, image, resolution, sprite_width, sprite_height)
+            indices = grid_to_indices(times, cells, equalizer)
+            with times.stage("composition"):
+                canvas = renderer.render(indices, output_size)
+            # O tempo até o próximo frame ser pedido é o da codificação deste
+            encode_start = perf_counter()
+            yield canvas
+            times.seconds["encode"] += perf_counter() - encode_start
+
+    silent_path = os.path.join(scratch, "stages_noaudio.mp4")
+    write_frames(frames(), silent_path, cap.get(cv2.CAP_PROP_FPS), palette)
+    cap.release()
+    with times.stage("mux"):
+        mux_audio(silent_path, path, os.path.join(scratch, "stages.mp4"))
+    return times.seconds
+
+#### GIF Encoders ####
+# Os mesmos frames convertidos, codificados de três jeitos:
+#   Pillow, RGB frames      -> o caminho original: canvas RGB e save(save_all=True), que quantiza cada frame
+#   GifWriter, full frames  -> frames com a paleta do filtro, gravados inteiros
+#   GifWriter, changed      -> o caminho atual: paleta do filtro e só a região que mudou em cada frame,
+#                              com os pixels iguais aos do frame anterior transparentes
+
+GIF_ENCODERS = ("Pillow, RGB frames", "GifWriter, full frames", "GifWriter, changed")
+
+def gif_encoders(path, resolution, atlas, palette, scratch):
+    renderer = IncrementalRenderer(atlas)
+    transparency = transparent_index(palette)
+    gif = Image.open(path)
+    frames = []
+    previous_disposal = None
+    for number in range(gif.n_frames):
+        gif.seek(number)
+        canvas = renderer.render_image(gif.convert("L"), resolution, True)
+        region, offset = changed_region(canvas, renderer, previous_disposal, transparency)
+        frames.append((canvas.copy(), region.copy(), offset, gif.info.get("duration", 0), gif.disposal_method))
+        previous_disposal = gif.disposal_method
+    loop = gif.info.get("loop")
+
+    def pillow_rgb(output):
+        images = [Image.fromarray(apply_palette(canvas, palette)) for canvas, _, _, _, _ in frames]
+        images[0].save(output, save_all=True, append_images=images[1:],
+                       duration=[duration for _, _, _, duration, _ in frames], loop=loop or 0)
+
+    def full_frames(output):
+        with GifWriter(output, loop=loop, fixed_palette=True) as writer:
+            for canvas, _, _, duration, disposal in frames:
+                writer.write_frame(palette_image(canvas, palette), duration, disposal)
+
+    def changed_regions(output):
+        with GifWriter(output, loop=loop, fixed_palette=True, transparency=transparency) as writer:
+            for _, region, offset, duration, disposal in frames:
+                writer.write_frame(palette_image(region, gif_palette(palette)), duration, disposal, offset)
+
+    results = {}
+    for name, encode in zip(GIF_ENCODERS, (pillow_rgb, full_frames, changed_regions)):
+        output = os.path.join(scratch, f"encoder{len(results)}.gif")
+        runs = []
+        for _ in range(STAGE_RUNS):
+            start = perf_counter()
+            encode(output)
+            runs.append(perf_counter() - start)
+        results[name] = {"seconds": min(runs), "bytes": os.path.getsize(output)}
+    return results
+
+#### Cases ####
+
+# Etapas e conversão completa de um caso; roda em um processo novo, já que o RSS de pico é por processo
+def run_case(case, media_path, scratch):
+    name, kind, width, height, frames, resolution = case
+    # A mídia sintética é sempre a mesma, então o cache de chunks transformaria as execuções seguintes
+    # em leituras do cache (a variável vale só para este processo e os pools que ele abre)
+    os.environ[CHUNK_CACHE_ENV] = "0"
+    atlas, _, palette = load_sprites()
+    runs = []
+    for _ in range(STAGE_RUNS):
+        if kind == "image":
+            runs.append(image_stages(media_path, resolution, atlas, palette))
+        elif kind == "gif":
+            runs.append(gif_stages(media_path, resolution, atlas, palette))
+        else:
+            runs.append(video_stages(media_path, resolution, atlas, palette, scratch))
+    stages = {stage: min(run[stage] for run in runs) for stage in runs[0]}
+    encoders = gif_encoders(media_path, resolution, atlas, palette, scratch) if kind == "gif" else None
+
+    output = os.path.join(scratch, f"output{OUTPUT_EXTENSIONS[kind]}")
+    start = perf_counter()
+    if kind == "image":
+        image_processing(media_path, resolution, True, atlas, palette, output)
+    elif kind == "gif":
+        gif_processing(media_path, resolution, True, atlas, palette, output)
+    else:
+        video_processing(media_path, resolution, True, atlas, palette, output)
+    total = perf_counter() - start
+
+    return {"kind": kind, "frames": frames, "resolution": resolution, "stages": stages,
+            "total": total, "fps": frames / total, "peak_rss_mb": peak_rss_mb(), "encoders": encoders}
+
+# Tempo de importação em um interpretador novo (o menor de IMPORT_RUNS execuções)
+def import_time(module):
+    code = f"from time import perf_counter; start = perf_counter(); import {module}; print(perf_counter() - start)"
+    runs = []
+    for _ in range(IMPORT_RUNS):
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=PROJECT_DIR)
+        if result.returncode != 0:
+            return None
+        runs.append(float(result.stdout))
+    return min(runs)
+
+#### Regressions ####
+
+def regression(name, old, new, minimum, unit):
+    if old is None or new is None or new <= old * (1 + REGRESSION_TOLERANCE) or new - old < minimum:
+        return None
+    return f"[ Regression ] {name}: {old:.3f} {unit} -> {new:.3f} {unit} (+{new - old:.3f} {unit})"
+
+# Lista de regressões em relação ao baseline (casos e etapas que não existem nos dois são ignorados)
+def compare(results, baseline):
+    found = []
+    for module, seconds in results["imports"].items():
+        found.append(regression(f"import {module}", baseline.get("imports", {}).get(module), seconds, MIN_SECONDS, "s"))
+    for name, case in results["cases"].items():
+        old = baseline.get("cases", {}).get(name)
+        if old is None:
+            continue
+        for stage, seconds in case["stages"].items():
+            found.append(regression(f"{name} {stage}", old["stages"].get(stage), seconds, MIN_SECONDS, "s"))
+        found.append(regression(f"{name} total", old.get("total"), case["total"], MIN_SECONDS, "s"))
+        found.append(regression(f"{name} peak RSS", old.get("peak_rss_mb"), case["peak_rss_mb"], MIN_RSS_MB, "MB"))
+        for encoder, result in (case.get("encoders") or {}).items():
+            old_seconds = (old.get("encoders") or {}).get(encoder, {}).get("seconds")
+            found.append(regression(f"{name} encoder {encoder}", old_seconds, result["seconds"], MIN_SECONDS, "s"))
+    return [message for message in found if message is not None]
+
+class BenchmarkReport:
+    def __init__(self, results, regressions=None):
+        self.results = results
+        self.regressions = regressions
+
+    def __str__(self):
+        lines = [f"{'case':<17}{'fps':>8}{'RSS MB':>8}  " + "".join(f"{stage:>14}" for stage in VIDEO_STAGES) + "   (ms per frame)"]
+        for name, case in self.results["cases"].items():
+            rss = f"{case['peak_rss_mb']:.0f}" if case["peak_rss_mb"] is not None else "-"
+            stages = "".join(f"{case['stages'][stage] * 1000 / case['frames']:>14.2f}" if stage in case["stages"] else f"{'-':>14}"
+                             for stage in VIDEO_STAGES)
+            lines.append(f"{name:<17}{case['fps']:>8.1f}{rss:>8}  {stages}")
+        for name, case in self.results["cases"].items():
+            if not case.get("encoders"):
+                continue
+            # Comparado com o caminho original (Pillow com frames RGB)
+            baseline = case["encoders"][GIF_ENCODERS[0]]
+            for encoder, result in case["encoders"].items():
+                lines.append(f"{name} encoder {encoder + ':':<24}{result['seconds'] * 1000:>9.1f} ms "
+                             f"({result['seconds'] / baseline['seconds']:>5.2f}x time), {result['bytes'] / 1024:>8.1f} KB "
+                             f"({result['bytes'] / baseline['bytes']:>5.2f}x size)")
+        for module, seconds in self.results["imports"].items():
+            lines.append(f"import {module}: " + (f"{seconds * 1000:.1f} ms" if seconds is not None else "failed"))
+        if self.regressions is not None:
+            lines.extend(self.regressions or ["No regressions against the baseline"])
+        return "\n".join(lines)
+
+#### Benchmark ####
+
+# O caso roda em um processo novo (spawn, para não herdar a memória e o pico de RSS deste processo)
+# que não é daemon, já que a conversão completa abre os próprios pools
+def case_process(connection, case, media_path, scratch):
+    try:
+        connection.send(run_case(case, media_path, scratch))
+    except Exception as exception:
+        connection.send(exception)
+    finally:
+        connection.close()
+
+def isolated_case(case, media_path, scratch):
+    context = get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=case_process, args=(sender, case, media_path, scratch))
+    process.start()
+    sender.close()
+    try:
+        result = receiver.recv()
+    except EOFError:
+        result = None
+    process.join()
+    if result is None:
+        raise RuntimeError(f"the benchmark process for '{case[0]}' exited with code {process.exitcode}")
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+# Roda todos os casos e salva o JSON em output_file; com baseline, compara os resultados com ele.
+# O relatório tem a lista de regressões (vazia se nenhuma etapa piorou além da tolerância).
+def run_benchmark(output_file=None, baseline=None, cases=CASES):
+    if output_file == None:
+        output_file = default_output("benchmark.json")
+    if baseline != None:
+        with open(baseline) as file:
+            baseline = json.load(file)
+    results = {"version": BENCHMARK_VERSION, "python": platform.python_version(), "machine": platform.machine(),
+               "cpus": os.cpu_count(), "imports": {module: import_time(module) for module in IMPORTS}, "cases": {}}
+
+    with scratch_job("benchmark") as scratch:
+        for case in cases:
+            name, kind, width, height, frames, _ = case
+            media_path = os.path.join(scratch, f"{kind}_{width}x{height}{MEDIA_EXTENSIONS[kind]}")
+            make_media(kind, media_path, width, height, frames)
+            case_scratch = os.path.join(scratch, f"case{len(results['cases'])}")
+            os.makedirs(case_scratch)
+            results["cases"][name] = isolated_case(case, media_path, case_scratch)
+
+    with open(output_file, "w") as file:
+        json.dump(results, file, indent=1)
+
+    regressions = None if baseline == None else compare(results, baseline)
+    return BenchmarkReport(results, regressions)
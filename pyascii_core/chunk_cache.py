@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import os
+from .grid_format import GRID_EXTENSION, GridWriter, GridReader
+from .paths import cache_dir
+
+##### Chunk Cache #####
+# As grades de células (antes do contraste) de cada chunk de vídeo reduzido ficam salvas no cache, um
+# arquivo .pyascii por chunk. O nome do arquivo é o hash de tudo o que define as grades: o conteúdo da
+# fonte, o intervalo de frames, a resolução, a amostragem e o formato do atlas (número e tamanho dos
+# sprites). O filtro e o contraste não fazem parte da chave, já que são aplicados depois, em ordem:
+# converter o mesmo vídeo com outro filtro ou outro modo de contraste reaproveita todos os chunks e
+# pula a decodificação e a redução.
+# Um chunk só aparece no cache depois de terminado (arquivo temporário e rename), então uma conversão
+# interrompida continua, na próxima execução, a partir dos chunks que faltaram.
+# O tamanho é limitado (LRU): cada chunk lido tem a data de modificação atualizada e, no fim de cada
+# conversão, os menos usados recentemente são apagados até o total caber no limite.
+# PYASCII_CHUNK_CACHE_MB (ou --chunk-cache) muda o limite; 0 desliga o cache.
+
+CHUNK_CACHE_ENV = "PYASCII_CHUNK_CACHE_MB"
+DEFAULT_CHUNK_CACHE_MB = 2048
+CHUNK_CACHE_VERSION = 2 # Muda quando as grades geradas mudam, invalidando os chunks antigos
+
+# Lido a cada conversão, para valer também quando a variável é definida depois do import
+def chunk_cache_limit():
+    return int(os.environ.get(CHUNK_CACHE_ENV, DEFAULT_CHUNK_CACHE_MB)) * 1024 * 1024
+
+# Hash do conteúdo da fonte: o mesmo vídeo copiado ou renomeado continua com os mesmos chunks
+def source_digest(path):
+    with open(path, "rb") as file:
+        return hashlib.file_digest(file, "sha256").hexdigest()[:32]
+
+def chunk_key(digest, start, end, atlas_shape, resolution, sampling):
+    settings = [CHUNK_CACHE_VERSION, digest, start, end, list(atlas_shape), resolution, sampling]
+    return hashlib.sha256(json.dumps(settings).encode("utf-8")).hexdigest()[:32]
+
+def chunk_path(key):
+    return os.path.join(cache_dir("chunks"), key + GRID_EXTENSION)
+
+# Devolve (grades, tamanho da saída) do chunk, ou None se ele não está no cache
+def load_chunk(key):
+    path = chunk_path(key)
+    try:
+        with GridReader(path) as reader:
+            output_size = reader.metadata["output_size"]
+            grids = [cells for cells, _ in reader.frames()]
+        os.utime(path) # Usado agora, para o LRU
+    except (OSError, ValueError, KeyError):
+        return None
+    return grids, tuple(output_size) if output_size else None
+
+# Sem cache gravável (disco cheio, pasta sem permissão) o chunk simplesmente não é guardado
+def save_chunk(key, grids, output_size, frame_range):
+    temp_path = None
+    try:
+        path = chunk_path(key)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with GridWriter(temp_path, {"output_size": output_size, "frames": list(frame_range)}) as writer:
+            for indices in grids:
+                writer.write_frame(indices)
+        os.replace(temp_path, path)
+    except OSError:
+        if temp_path is None:
+            return
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+# Apaga os chunks usados há mais tempo até o cache caber em limit bytes. Arquivos temporários de
+# processos encerrados no meio da gravação também entram na conta e acabam apagados.
+def evict_chunks(limit=None):
+    if limit == None:
+        limit = chunk_cache_limit()
+    try:
+        entries = list(os.scandir(cache_dir("chunks")))
+    except OSError:
+        return
+    files = []
+    for entry in entries:
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue # Apagado por outra conversão ao mesmo tempo
+        files.append((stat.st_mtime_ns, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= limit:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total -= size
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+
+from PIL import Image
+from multiprocessing import Pool
+from collections import deque
+import numpy as np
+from .renderer import scaled_size, grid_size, image_to_indices, render_indices, contrast_mode, ContrastEqualizer, IncrementalRenderer, ReuseStats
+from .sprites import palette_image
+from .gif_writer import GifWriter, EncodeStats
+from .profiling import span
+from .progress import report
+from .planner import GIF_CHUNK_FRAMES, plan_chunks
+
+##### Parallel GIF Pipeline #####
+# O GIF só pode ser decodificado em sequência, então o processo principal decodifica cada frame
+# (já em escala de cinza), o reduz à grade de células e aplica o contraste, que depende dos frames
+# anteriores; chunks de grades de índices consecutivas vão para o pool. Cada processo renderiza e
+# codifica os frames do seu chunk (a codificação LZW é a parte mais cara) e devolve os bytes
+# prontos, que são gravados em ordem assim que o próximo chunk da sequência fica pronto.
+# Com um único equalizador em ordem, o resultado é o mesmo da conversão em um processo só.
+
+class GifStats:
+    def __init__(self, reuse, encode):
+        self.reuse = reuse
+        self.encode = encode
+
+    def __str__(self):
+        return f"{self.reuse}\n{self.encode}"
+
+# Índice da paleta reservado para a transparência: logo depois das cores do filtro, ou None
+# se a paleta já ocupa os 256 índices do GIF
+def transparent_index(palette):
+    return len(palette) if len(palette) < 256 else None
+
+# Paleta global do GIF: as cores do filtro mais a entrada reservada para a transparência
+def gif_palette(palette):
+    if transparent_index(palette) == None:
+        return palette
+    return np.concatenate([palette, np.zeros((1, 3), dtype=palette.dtype)])
+
+# Recorta do canvas só a região que mudou desde o frame anterior e devolve (recorte, posição).
+# Isso só vale se o frame anterior continua na tela (disposal 0 ou 1); depois de um disposal 2/3
+# (ou no primeiro frame) o frame é gravado inteiro. Um frame idêntico vira um único pixel.
+# Com transparency, os pixels do recorte iguais aos do frame anterior recebem esse índice, então
+# só os pixels alterados são gravados e o LZW comprime o resto como uma sequência repetida.
+def changed_region(canvas, renderer, previous_disposal, transparency=None):
+    if previous_disposal not in (0, 1):
+        return canvas, (0, 0)
+    if renderer.dirty_box is None:
+        return canvas[:1, :1], (0, 0)
+    left, top, right, bottom = (int(value) for value in renderer.dirty_box)
+    region = canvas[top:bottom, left:right]
+    previous = renderer.previous_indices
+    if transparency == None or previous is None or previous.shape != renderer.indices.shape:
+        return region, (left, top)
+
+    # O recorte começa no canto de uma célula, então basta renderizar as células anteriores dele
+    _, sprite_height, sprite_width = renderer.atlas.shape
+    cells = previous[top // sprite_height:-(-bottom // sprite_height), left // sprite_width:-(-right // sprite_width)]
+    before = render_indices(cells, renderer.atlas, (right - left, bottom - top))
+    region = region.copy() # O canvas é o buffer do renderer e continua sendo usado no próximo frame
+    region[region == before] = transparency
+    return region, (left, top)
+
+gif_settings = {}
+
+def init_gif_worker(atlas, palette, output_size):
+    gif_settings.update(atlas=atlas, palette=gif_palette(palette), transparency=transparent_index(palette), output_size=output_size)
+
+# Gera (pixels em escala de cinza, duração, disposal) de cada frame, preservando o tempo e o
+# modo de descarte de cada um
+def decode_gif(gif):
+    for frame in range(0, gif.n_frames):
+        with span("decode", frame=frame):
+            gif.seek(frame)
+            pixels = np.asarray(gif.convert("L"))
+        yield pixels, gif.info.get('duration', 0), gif.disposal_method
+
+# Troca os pixels de cada frame de decode_gif pela grade de índices, com o contraste mantido entre os frames
+def gif_indices(frames, atlas_shape, resolution, high_contrast, sampling="area"):
+    _, sprite_height, sprite_width = atlas_shape
+    equalizer = ContrastEqualizer(contrast_mode(high_contrast))
+    for number, (pixels, duration, disposal) in enumerate(frames):
+        with span("reduce", frame=number):
+            indices, _ = image_to_indices(Image.fromarray(pixels), resolution, high_contrast, sprite_width, sprite_height, sampling, equalizer)
+        yield indices, duration, disposal
+
+# Gera (frame anterior, chunk); o último frame do chunk anterior vai junto para que o processo
+# saiba o que já está na tela e possa gravar só a região alterada do primeiro frame do chunk
+def gif_chunks(frames, chunk_frames):
+    previous = None
+    chunk = []
+    for frame in frames:
+        chunk.append(frame)
+        if len(chunk) == chunk_frames:
+            yield previous, chunk
+            previous = chunk[-1]
+            chunk = []
+    if chunk:
+        yield previous, chunk
+
+# Renderiza e codifica um chunk; os frames usam a paleta global do arquivo (a paleta do filtro).
+# first_frame é o número do primeiro frame do chunk no GIF (usado somente no profiling)
+def encode_gif_chunk(previous, frames, first_frame=0):
+    renderer = IncrementalRenderer(gif_settings["atlas"])
+    palette, output_size = gif_settings["palette"], gif_settings["output_size"]
+    transparency = gif_settings["transparency"]
+    previous_disposal = None
+    if previous is not None:
+        indices, _, previous_disposal = previous
+        renderer.render(indices, output_size)
+        renderer.stats = ReuseStats() # O frame anterior já foi contado pelo chunk dele
+
+    encode_stats = EncodeStats()
+    encoded = []
+    for number, (indices, duration, disposal) in enumerate(frames, first_frame):
+        with span("convert", frame=number):
+            canvas = renderer.render(indices, output_size)
+        with span("encode", frame=number):
+            region, offset = changed_region(canvas, renderer, previous_disposal, transparency)
+            encoded.append(encode_stats.encode(palette_image(region, palette), duration, disposal, offset=offset,
+                                               frame_size=canvas.shape[::-1], transparency=transparency))
+        previous_disposal = disposal
+    return encoded, renderer.stats, encode_stats
+
+# chunk_frames é o número de frames por chunk (por padrão GIF_CHUNK_FRAMES); max_memory (bytes)
+# limita a memória ocupada pelos chunks em andamento, como no vídeo
+def parallel_gif(gif, output_file, atlas, palette, resolution, high_contrast, sampling="area", workers=2, chunk_frames=None, max_memory=None):
+    stats = GifStats(ReuseStats(), None)
+    output_size = scaled_size(gif.size, resolution)
+    _, sprite_height, sprite_width = atlas.shape
+    cols, rows = grid_size(output_size, sprite_width, sprite_height)
+    # Limita as grades e os frames codificados em memória
+    chunk_frames, max_in_flight = plan_chunks(cols * rows + output_size[0] * output_size[1], workers,
+                                              GIF_CHUNK_FRAMES, chunk_frames, max_memory)
+    with GifWriter(output_file, loop=gif.info.get("loop"), fixed_palette=True) as writer:
+        header = Image.new("P", output_size)
+        header.putpalette(gif_palette(palette).tobytes())
+        writer.write_header(header)
+
+        with Pool(workers, initializer=init_gif_worker, initargs=(atlas, palette, output_size)) as pool:
+            in_flight = deque()
+            first_frame = 0
+            frames = gif_indices(decode_gif(gif), atlas.shape, resolution, high_contrast, sampling)
+            for previous, chunk in gif_chunks(frames, chunk_frames):
+                in_flight.append(pool.apply_async(encode_gif_chunk, (previous, chunk, first_frame)))
+                first_frame += len(chunk)
+                if len(in_flight) >= max_in_flight:
+                    write_gif_chunk(writer, in_flight.popleft(), stats, gif.n_frames)
+            while in_flight:
+                write_gif_chunk(writer, in_flight.popleft(), stats, gif.n_frames)
+    stats.encode = writer.stats
+    return stats
+
+def write_gif_chunk(writer, result, stats, total_frames=None):
+    with span("wait chunk"):
+        encoded, reuse_stats, encode_stats = result.get()
+    stats.reuse.add(reuse_stats)
+    writer.stats.add(encode_stats)
+    for data in encoded:
+        writer.write_encoded(data)
+    report(writer.frame_count, total_frames)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+from PIL import Image, GifImagePlugin
+from time import perf_counter
+
+##### Streaming GIF Writer #####
+# Grava cada frame no arquivo assim que ele fica pronto, em vez de acumular todos
+# os frames em uma lista até o save(save_all=True) final.
+
+# Codifica um frame "P" (cabeçalho local + dados LZW) na posição offset da tela.
+# Sem tabela de cores local, o frame usa a paleta global do arquivo.
+# transparency é o índice da paleta que deixa aparecer o frame anterior (None = sem transparência).
+def encode_frame(image, duration=0, disposal=0, include_color_table=False, offset=(0, 0), transparency=None):
+    params = {"duration": duration, "disposal": disposal}
+    if include_color_table:
+        params["include_color_table"] = True
+    if transparency != None:
+        params["transparency"] = transparency
+    return b"".join(GifImagePlugin.getdata(image, offset, **params))
+
+# Tempo de codificação e área gravada (os frames podem ser só a região que mudou)
+class EncodeStats:
+    def __init__(self):
+        self.frames = 0
+        self.seconds = 0
+        self.pixels_written = 0
+        self.pixels = 0 # Área total dos frames inteiros
+        self.bytes = 0
+
+    def encode(self, image, duration=0, disposal=0, include_color_table=False, offset=(0, 0), frame_size=None, transparency=None):
+        start = perf_counter()
+        data = encode_frame(image, duration, disposal, include_color_table, offset, transparency)
+        self.seconds += perf_counter() - start
+        width, height = frame_size or image.size
+        self.frames += 1
+        self.pixels_written += image.width * image.height
+        self.pixels += width * height
+        return data
+
+    def add(self, other):
+        self.frames += other.frames
+        self.seconds += other.seconds
+        self.pixels_written += other.pixels_written
+        self.pixels += other.pixels
+
+    def __str__(self):
+        area = self.pixels_written / self.pixels if self.pixels else 0
+        return (f"Encoded {self.frames} GIF frames in {self.seconds:.2f} seconds, {self.bytes / 1024:.1f} KB "
+                f"(changed regions: {area:.1%} of the frame area)")
+
+class GifWriter:
+    # loop = None grava um GIF que toca uma vez só (sem a extensão NETSCAPE).
+    # fixed_palette indica que todos os frames usam a paleta do primeiro (a paleta do filtro),
+    # então ela é gravada só uma vez como paleta global, sem tabelas locais.
+    # transparency é o índice reservado da paleta global para os pixels que não mudaram.
+    def __init__(self, filename, loop=0, fixed_palette=False, transparency=None):
+        self.file = open(filename, "wb")
+        self.loop = loop
+        self.fixed_palette = fixed_palette
+        self.transparency = transparency
+        self.header_written = False
+        self.frame_count = 0
+        self.size = None
+        self.stats = EncodeStats()
+
+    # O tamanho e a paleta da imagem viram o tamanho da tela e a paleta global
+    def write_header(self, image):
+        info = {} if self.loop is None else {"loop": self.loop}
+        header, _ = GifImagePlugin.getheader(image, info=info)
+        self.file.write(b"".join(header))
+        self.header_written = True
+        self.size = image.size
+
+    # offset posiciona um frame menor do que a tela (somente a região que mudou);
+    # o primeiro frame define o tamanho da tela e precisa ser inteiro
+    def write_frame(self, image, duration=0, disposal=0, offset=(0, 0)):
+        frame = image if image.mode == "P" else image.convert("P", palette=Image.Palette.ADAPTIVE)
+        if not self.header_written:
+            self.write_header(frame)
+        include_color_table = self.frame_count > 0 and not self.fixed_palette
+        self.write_encoded(self.stats.encode(frame, duration, disposal, include_color_table, offset, self.size, self.transparency))
+
+    # Grava um frame já codificado por encode_frame (por exemplo, em outro processo)
+    def write_encoded(self, data):
+        self.file.write(data)
+        self.frame_count += 1
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.file.write(b";") # Fim do arquivo
+        self.stats.bytes = self.file.tell()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
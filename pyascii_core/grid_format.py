@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+
+from PIL import Image
+import numpy as np
+import struct
+import json
+import zlib
+import os
+from .renderer import scaled_size, gray_image, image_to_indices, indices_to_text, IncrementalRenderer, contrast_mode, ContrastEqualizer
+from .sprites import palette_image
+from .gif_writer import GifWriter
+from .gif_pipeline import changed_region, gif_palette, transparent_index
+from .paths import default_output, scratch_job
+
+##### .pyascii Glyph Grid Format #####
+# Guarda apenas as grades de índices de sprite (uint8, 0 a 16) de cada frame, com os metadados
+# necessários para renderizar de novo em qualquer filtro/formato sem decodificar a fonte.
+#
+# Layout do arquivo:
+#   GRID_MAGIC | versão (u16) | tamanho do JSON (u32) | JSON com os metadados
+#   registros de frame até o fim do arquivo: tipo (u8) | duração em ms (u32) | tamanho dos dados (u32) | dados
+# A duração é 0 para vídeos (usa-se o fps dos metadados).
+
+GRID_MAGIC = b"PYASCII\x00"
+GRID_VERSION = 1
+GRID_EXTENSION = ".pyascii"
+
+HEADER = struct.Struct("<HI")
+RECORD = struct.Struct("<BII")
+
+KEY_FRAME = 0    # Grade completa comprimida com zlib
+DELTA_FRAME = 1  # XOR com a grade anterior, comprimido com zlib
+REPEAT_FRAME = 2 # Grade idêntica à anterior, sem dados
+
+class GridWriter:
+    # Um keyframe a cada keyframe_interval frames limita o tamanho das cadeias de deltas
+    def __init__(self, filename, metadata, keyframe_interval=250):
+        self.file = open(filename, "wb")
+        self.metadata = dict(metadata)
+        self.keyframe_interval = keyframe_interval
+        self.previous = None
+        self.since_keyframe = 0
+
+    def write_header(self, grid_shape):
+        self.metadata["grid_size"] = [grid_shape[1], grid_shape[0]] # (colunas, linhas)
+        metadata = json.dumps(self.metadata).encode("utf-8")
+        self.file.write(GRID_MAGIC + HEADER.pack(GRID_VERSION, len(metadata)) + metadata)
+
+    def write_frame(self, indices, duration=0):
+        indices = np.ascontiguousarray(indices, dtype=np.uint8)
+        if self.previous is None:
+            self.write_header(indices.shape)
+            kind = KEY_FRAME
+        elif indices.shape != self.previous.shape:
+            raise ValueError(f"Grid shape changed from {self.previous.shape} to {indices.shape}")
+        elif np.array_equal(indices, self.previous):
+            kind = REPEAT_FRAME
+        elif self.since_keyframe >= self.keyframe_interval:
+            kind = KEY_FRAME
+        else:
+            kind = DELTA_FRAME
+
+        if kind == KEY_FRAME:
+            data = zlib.compress(indices.tobytes())
+            self.since_keyframe = 0
+        elif kind == DELTA_FRAME:
+            data = zlib.compress(np.bitwise_xor(indices, self.previous).tobytes())
+        else:
+            data = b""
+
+        self.file.write(RECORD.pack(kind, int(round(duration)), len(data)) + data)
+        self.previous = indices
+        self.since_keyframe += 1
+
+    def close(self):
+        if self.file.closed:
+            return
+        if self.previous is None:
+            self.write_header((0, 0))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+class GridReader:
+    def __init__(self, filename):
+        self.file = open(filename, "rb")
+        if self.file.read(len(GRID_MAGIC)) != GRID_MAGIC:
+            self.file.close()
+            raise ValueError(f"'{filename}' is not a {GRID_EXTENSION} file")
+        version, metadata_size = HEADER.unpack(self.file.read(HEADER.size))
+        if version > GRID_VERSION:
+            self.file.close()
+            raise ValueError(f"'{filename}' uses format version {version}, newer than the supported version {GRID_VERSION}")
+        self.metadata = json.loads(self.file.read(metadata_size))
+
+    # Gera (grade de índices, duração em ms) para cada frame
+    def frames(self):
+        cols, rows = self.metadata["grid_size"]
+        indices = None
+        while True:
+            record = self.file.read(RECORD.size)
+            if len(record) < RECORD.size:
+                break
+            kind, duration, size = RECORD.unpack(record)
+            data = self.file.read(size)
+            if kind == KEY_FRAME:
+                indices = np.frombuffer(zlib.decompress(data), dtype=np.uint8).reshape(rows, cols)
+            elif kind == DELTA_FRAME:
+                indices = np.bitwise_xor(indices, np.frombuffer(zlib.decompress(data), dtype=np.uint8).reshape(rows, cols))
+            yield indices, duration
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def is_grid_file(file_path):
+    try:
+        with open(file_path, "rb") as file:
+            return file.read(len(GRID_MAGIC)) == GRID_MAGIC
+    except OSError:
+        return False
+
+#### Capture (mídia -> .pyascii) ####
+
+def grid_metadata(source_name, source_type, source_size, resolution, high_contrast, sampling, sprite_width, sprite_height, fps=None):
+    return {
+        "source": {"path": os.path.abspath(source_name), "type": source_type, "size": list(source_size)},
+        "fps": fps,
+        "cell_size": [sprite_width, sprite_height],
+        "output_size": list(scaled_size(source_size, resolution)),
+        "resolution": resolution,
+        "high_contrast": high_contrast,
+        "sampling": sampling,
+    }
+
+def save_image_grid(image_name, output_file, resolution, high_contrast, sprite_width, sprite_height, sampling="area"):
+    image = Image.open(image_name).convert("L")
+    metadata = grid_metadata(image_name, "image", image.size, resolution, high_contrast, sampling, sprite_width, sprite_height)
+    with GridWriter(output_file, metadata) as writer:
+        writer.write_frame(image_to_indices(image, resolution, high_contrast, sprite_width, sprite_height, sampling)[0])
+
+def save_gif_grid(gif_name, output_file, resolution, high_contrast, sprite_width, sprite_height, sampling="area"):
+    equalizer = ContrastEqualizer(contrast_mode(high_contrast))
+    with Image.open(gif_name) as gif:
+        metadata = grid_metadata(gif_name, "gif", gif.size, resolution, high_contrast, sampling, sprite_width, sprite_height)
+        with GridWriter(output_file, metadata) as writer:
+            for frame in range(0, gif.n_frames):
+                gif.seek(frame)
+                indices, _ = image_to_indices(gif.convert("L"), resolution, high_contrast, sprite_width, sprite_height, sampling, equalizer)
+                writer.write_frame(indices, gif.info.get('duration', 0))
+
+def save_video_grid(video_name, output_file, resolution, high_contrast, sprite_width, sprite_height, sampling="area"):
+    from .video_pipeline import read_frames
+    from .probe import probe_video
+
+    info = probe_video(video_name)
+    metadata = grid_metadata(video_name, "video", info.size, resolution, high_contrast, sampling,
+                             sprite_width, sprite_height, fps=info.fps)
+    equalizer = ContrastEqualizer(contrast_mode(high_contrast))
+    with GridWriter(output_file, metadata) as writer:
+        for frame in read_frames(video_name):
+            image = gray_image(frame)
+            writer.write_frame(image_to_indices(image, resolution, high_contrast, sprite_width, sprite_height, sampling, equalizer)[0])
+
+#### Export (.pyascii -> MP4, GIF, PNG, texto) ####
+
+DEFAULT_OUTPUTS = {
+    "image": "PyAscii_image.png",
+    "gif": "PyAscii_gif.gif",
+    "video": "PyASCII.mp4",
+}
+EXPORT_EXTENSIONS = (".mp4", ".gif", ".png", ".txt")
+
+def export_grid(grid_name, output_file, atlas, palette):
+    with GridReader(grid_name) as reader:
+        metadata = reader.metadata
+        _, sprite_height, sprite_width = atlas.shape
+        if metadata["cell_size"] != [sprite_width, sprite_height]:
+            raise ValueError(f"'{grid_name}' was made with {metadata['cell_size'][0]}x{metadata['cell_size'][1]} cells, "
+                             f"but the sprite sheet has {sprite_width}x{sprite_height} sprites!")
+
+        source = metadata["source"]
+        if output_file == None:
+            output_file = default_output(DEFAULT_OUTPUTS[source["type"]])
+        stem, extension = os.path.splitext(output_file)
+        extension = extension.lower()
+        if extension not in EXPORT_EXTENSIONS:
+            raise ValueError(f"'{output_file}' has an unsupported extension, a {GRID_EXTENSION} file can be exported to "
+                             + ", ".join(EXPORT_EXTENSIONS) + "!")
+        output_size = tuple(metadata["output_size"])
+        renderer = IncrementalRenderer(atlas)
+
+        if extension == ".txt":
+            with open(output_file, "w") as file:
+                for number, (indices, _) in enumerate(reader.frames()):
+                    if number:
+                        file.write("\n")
+                    file.write(indices_to_text(indices))
+        elif extension == ".gif":
+            # Grades de vídeo não guardam a duração de cada frame (0); ela vem do fps
+            frame_duration = round(1000 / metadata["fps"]) if metadata["fps"] else 0
+            transparency = transparent_index(palette)
+            with GifWriter(output_file, fixed_palette=True, transparency=transparency) as writer:
+                previous_disposal = None
+                for indices, duration in reader.frames():
+                    region, offset = changed_region(renderer.render(indices, output_size), renderer, previous_disposal, transparency)
+                    writer.write_frame(palette_image(region, gif_palette(palette)), duration or frame_duration, offset=offset)
+                    previous_disposal = 0
+        elif extension == ".png":
+            if source["type"] == "image":
+                for indices, _ in reader.frames():
+                    palette_image(renderer.render(indices, output_size), palette).save(output_file)
+            else:
+                # Animações viram uma sequência stem_00000.png, stem_00001.png, ...
+                for number, (indices, _) in enumerate(reader.frames()):
+                    palette_image(renderer.render(indices, output_size), palette).save(f"{stem}_{number:05d}.png")
+        else:
+            # MP4: o fps vem dos metadados (ou da duração dos frames de um GIF)
+            from .video_pipeline import write_frames
+            from .audio_mux import mux_audio
+
+            fps = metadata["fps"]
+            frames = (renderer.render(indices, output_size) for indices, _ in reader.frames())
+            if fps is None:
+                frames = list(reader.frames())
+                durations = [duration for _, duration in frames] or [100]
+                fps = 1000 / (sum(durations) / len(durations) or 100)
+                frames = (renderer.render(indices, output_size) for indices, _ in frames)
+
+            if source["type"] == "video" and os.path.exists(source["path"]):
+                # O áudio original é copiado de volta, sem recodificar
+                with scratch_job("export") as scratch:
+                    no_audio_path = os.path.join(scratch, f"noaudio{extension}")
+                    write_frames(frames, no_audio_path, fps, palette)
+                    mux_audio(no_audio_path, source["path"], output_file)
+            else:
+                write_frames(frames, output_file, fps, palette)
+    return output_file
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+from contextlib import contextmanager
+import tempfile
+import shutil
+import errno
+import os
+try:
+    import fcntl
+except ImportError: # Windows: sem flock, as pastas de processos encerrados não são removidas
+    fcntl = None
+
+# A sprite sheet e os filtros ficam na pasta do projeto, ao lado dos scripts;
+# as saídas padrão vão para ./PyASCII/output, a partir da pasta atual.
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SPRITE_SHEET = os.path.join(PROJECT_DIR, "sprite_sheet.png")
+FILTERS_FILE = os.path.join(PROJECT_DIR, "filters.toml")
+OUTPUT_DIR = os.path.join(".", "PyASCII", "output")
+
+# Caminho de uma saída padrão; a pasta só é criada quando alguma saída padrão é usada
+def default_output(file_name):
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    return os.path.join(OUTPUT_DIR, file_name)
+
+# Processos usados por padrão nos pools de vídeo, GIF e lote (um núcleo fica livre)
+def default_workers():
+    return max(1, (os.cpu_count() or 1) - 1)
+
+# Cache persistente entre execuções (atlas pré-montados, ...). PYASCII_CACHE_DIR muda o local.
+CACHE_DIR = os.environ.get("PYASCII_CACHE_DIR") or os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "pyascii")
+
+# Pasta dentro do cache; como as saídas padrão, só é criada quando usada
+def cache_dir(name):
+    path = os.path.join(CACHE_DIR, name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+#### Scratch Space ####
+# Arquivos intermediários (o vídeo sem áudio antes do mux, o trace do profiling, ...) ficam em uma
+# pasta própria de cada conversão, então várias conversões podem rodar ao mesmo tempo na mesma
+# máquina. A raiz é a pasta temporária do sistema; PYASCII_SCRATCH_DIR (ou --scratch-dir) muda a
+# raiz, por exemplo para /dev/shm. A pasta é apagada no fim da conversão, mesmo com erro ou
+# cancelamento. Enquanto a conversão roda, ela segura uma trava (flock) no arquivo de trava da
+# pasta; o sistema solta a trava quando o processo termina, de qualquer jeito (inclusive kill -9),
+# então a próxima conversão remove as pastas cuja trava está livre. Ao contrário do pid, a trava
+# não pode ser confundida com a de outro processo que recebeu o mesmo número.
+
+SCRATCH_ENV = "PYASCII_SCRATCH_DIR"
+SCRATCH_RESERVE = 256 * 1024 * 1024 # Espaço que sempre deve sobrar no disco da raiz
+SCRATCH_LOCK = "scratch.lock"
+
+scratch_locks = {} # Pasta -> arquivo de trava aberto, mantido até remove_scratch_dir
+
+def scratch_root():
+    return os.environ.get(SCRATCH_ENV) or tempfile.gettempdir()
+
+# Cria e trava o arquivo de trava de uma pasta nova. Ele é travado com outro nome e só então
+# renomeado, para que nenhuma outra conversão o encontre destravado.
+def lock_scratch_dir(path):
+    temp_path = os.path.join(path, SCRATCH_LOCK + ".new")
+    lock = open(temp_path, "w")
+    fcntl.flock(lock, fcntl.LOCK_EX)
+    os.rename(temp_path, os.path.join(path, SCRATCH_LOCK))
+    return lock
+
+# Remove as pastas pyascii_* cuja trava está livre, ou seja, de conversões que já terminaram.
+# Pastas sem arquivo de trava não são tocadas.
+def remove_stale_scratch(root):
+    if fcntl is None:
+        return
+    for name in os.listdir(root):
+        lock_path = os.path.join(root, name, SCRATCH_LOCK)
+        if not name.startswith("pyascii_") or not os.path.isfile(lock_path):
+            continue
+        try:
+            lock = open(lock_path, "r")
+        except OSError:
+            continue # Apagada por outra conversão ao mesmo tempo, ou de outro usuário
+        with lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                continue # A conversão dona da pasta ainda está rodando
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+# Falha antes de começar se a conversão deixaria menos de SCRATCH_RESERVE livres
+def check_scratch_space(path, required_bytes):
+    free = shutil.disk_usage(path).free
+    if free - required_bytes < SCRATCH_RESERVE:
+        raise OSError(errno.ENOSPC, f"Not enough space for the scratch files: {free / 2 ** 20:.0f} MB free, "
+                                    f"the job needs about {required_bytes / 2 ** 20:.0f} MB plus a "
+                                    f"{SCRATCH_RESERVE / 2 ** 20:.0f} MB reserve", path)
+
+# Cria a pasta de uma conversão; kind não pode ter "_"
+def make_scratch_dir(kind):
+    root = scratch_root()
+    os.makedirs(root, exist_ok=True)
+    remove_stale_scratch(root)
+    path = tempfile.mkdtemp(prefix=f"pyascii_{kind}_{os.getpid()}_", dir=root)
+    if fcntl is not None:
+        scratch_locks[path] = lock_scratch_dir(path)
+    return path
+
+# Apaga a pasta de uma conversão e solta a trava dela
+def remove_scratch_dir(path):
+    shutil.rmtree(path, ignore_errors=True)
+    lock = scratch_locks.pop(path, None)
+    if lock is not None:
+        lock.close()
+
+# Pasta de uma conversão, apagada na saída do with; required_bytes é a estimativa do que será gravado nela
+@contextmanager
+def scratch_job(kind="job", required_bytes=0):
+    path = make_scratch_dir(kind)
+    try:
+        check_scratch_space(path, required_bytes)
+        yield path
+    finally:
+        remove_scratch_dir(path)
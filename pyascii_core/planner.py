@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+
+from PIL import Image
+from math import ceil
+import os
+from .renderer import scaled_size
+from .tiled import STRIP_BYTES, draft_size
+from .paths import default_workers
+
+##### Job Planner #####
+# A partir do MediaInfo da entrada e das opções da conversão, escolhe o modo, o número de processos
+# e o tamanho dos chunks, e estima o tempo e o pico de memória da conversão antes de começar
+# (--dry-run). As constantes foram medidas com conversões completas em uma máquina de referência
+# (um núcleo); são estimativas de ordem de grandeza, não promessas.
+
+# Segundos de CPU por pixel da fonte (decodificação, escala de cinza e redução à grade) e por pixel
+# da saída (composição e codificação). No vídeo a codificação do libx264 domina: ela acontece no
+# processo do ffmpeg, então o benchmark (que mede só a escrita no pipe) não a vê por inteiro.
+SOURCE_SECONDS_PER_PIXEL = {"image": 7e-9, "gif": 12e-9, "video": 12e-9}
+OUTPUT_SECONDS_PER_PIXEL = {"image": 6e-9, "gif": 10e-9, "video": 60e-9}
+STARTUP_SECONDS = 0.3 # Imports e atlas
+POOL_SECONDS = 0.3 # Criar um pool e carregar o atlas nos processos
+MUX_SECONDS_PER_FRAME = 0.0005
+
+PROCESS_BYTES = 64 * 1024 * 1024 # RSS de um processo com Python, numpy, PIL e OpenCV carregados
+ENCODER_BYTES = 64 * 1024 * 1024 # Processo do ffmpeg, fora os frames que ele guarda
+ENCODER_FRAMES = 40 # Frames que o libx264 mantém em memória (lookahead), em YUV 4:2:0
+
+# Estimativa (generosa) do tamanho do vídeo ASCII sem áudio, em bytes por pixel de cada frame
+VIDEO_BYTES_PER_PIXEL = 0.1
+SPRITE_PIXELS = 8 * 8 # Pixels da saída por célula da grade, com a sprite sheet padrão
+
+GIF_CHUNK_FRAMES = 16 # Frames por chunk de GIF; frames seguidos no mesmo processo permitem reaproveitar células
+
+# Escolhe o tamanho dos chunks (em frames) e quantos chunks podem estar em andamento
+# para que os frames de todos eles caibam em max_memory bytes. Cada frame de um chunk existe
+# duas vezes enquanto passa entre os processos (no processo que o gerou e na cópia recebida).
+# frame_bytes é o tamanho de um frame no chunk: no vídeo, a grade de células (1 byte por célula);
+# no GIF, a grade de índices que vai e o frame codificado que volta.
+def plan_chunks(frame_bytes, workers, default_chunk, chunk_size=None, max_memory=None):
+    max_in_flight = workers * 2
+    if max_memory is None:
+        return chunk_size or default_chunk, max_in_flight
+
+    frame_budget = max(1, max_memory // (2 * frame_bytes)) # Frames que cabem no limite
+    if chunk_size is None:
+        chunk_size = max(1, min(default_chunk, frame_budget // max_in_flight))
+    max_in_flight = max(1, min(max_in_flight, frame_budget // chunk_size))
+    return chunk_size, max_in_flight
+
+# O trabalho total dividido pelos núcleos que os processos conseguem ocupar, mas nunca menos do que a
+# parte que roda em um único processo (serial_seconds)
+def wall_seconds(cpu_seconds, processes, serial_seconds=0):
+    cores = min(processes, os.cpu_count() or 1)
+    return STARTUP_SECONDS + max(cpu_seconds / cores, serial_seconds)
+
+class JobPlan:
+    def __init__(self, info, mode, output_size, workers=1, chunk_size=None, max_in_flight=None, seconds=None, peak_bytes=None, scratch_bytes=0):
+        self.info = info
+        self.mode = mode
+        self.output_size = output_size
+        self.workers = workers
+        self.chunk_size = chunk_size # Frames por chunk (vídeo) ou linhas por faixa (tiled)
+        self.max_in_flight = max_in_flight
+        self.seconds = seconds
+        self.peak_bytes = peak_bytes
+        self.scratch_bytes = scratch_bytes
+
+    def __str__(self):
+        lines = [f"Input: {self.info}",
+                 f"Plan: {self.mode}, output {self.output_size[0]}x{self.output_size[1]}, {self.workers} worker(s)"]
+        if self.chunk_size:
+            unit = "rows per strip" if self.mode == "tiled" else "frames per chunk"
+            lines[-1] += f", {self.chunk_size} {unit}, {self.max_in_flight} in flight"
+        if self.seconds is not None:
+            lines.append(f"Estimated runtime: {self.seconds:.1f} seconds")
+        if self.peak_bytes is not None:
+            lines.append(f"Estimated peak memory: {self.peak_bytes / 2 ** 20:.0f} MB (all processes)")
+        if self.scratch_bytes:
+            lines.append(f"Estimated scratch space: {self.scratch_bytes / 2 ** 20:.0f} MB")
+        return "\n".join(lines)
+
+    # Para quem lê o plano de outro programa (--dry-run PLAN.json)
+    def as_dict(self):
+        plan = dict(vars(self))
+        plan["info"] = dict(vars(self.info))
+        return plan
+
+def plan_job(info, resolution, workers=None, chunk_size=None, max_memory=None, streaming=False, shared_memory=False, tiled=False, strip_height=None):
+    if info.kind == "grid":
+        return JobPlan(info, "grid export", info.size) # A grade já tem o tamanho da saída
+    output_size = scaled_size(info.size, resolution)
+
+    source_pixels = info.width * info.height
+    output_pixels = output_size[0] * output_size[1]
+    cells = -(-output_pixels // SPRITE_PIXELS) # Tamanho de uma grade de células, em bytes
+    frames = max(info.frames or 1, 1)
+    source_seconds = frames * source_pixels * SOURCE_SECONDS_PER_PIXEL[info.kind]
+    output_seconds = frames * output_pixels * OUTPUT_SECONDS_PER_PIXEL[info.kind]
+    cpu_seconds = source_seconds + output_seconds
+    workers = workers or default_workers()
+
+    if info.kind == "image":
+        # Imagens acima do limite de pixels do Pillow vão para o modo tiled somente se ele não precisa
+        # decodificá-las inteiras; as outras continuam recusadas pelo Pillow (a menos que --tiled seja pedido)
+        oversized = Image.MAX_IMAGE_PIXELS != None and source_pixels > Image.MAX_IMAGE_PIXELS
+        tiled = tiled or (oversized and info.streams)
+        if not tiled:
+            mode = "image (above Pillow's pixel limit, refused without --tiled)" if oversized else "image"
+            return JobPlan(info, mode, output_size, 1, seconds=wall_seconds(cpu_seconds, 1),
+                           peak_bytes=PROCESS_BYTES + source_pixels * 4 + output_pixels * 2)
+        # As mesmas contas do tiled_image: cada faixa guarda a fonte decodificada em RGBA
+        max_in_flight = workers * 2
+        if strip_height == None:
+            strip_bytes = STRIP_BYTES if max_memory == None else max(1, max_memory // (2 * max_in_flight))
+            strip_height = max(1, strip_bytes // (info.width * 4))
+        peak_bytes = (workers + 1) * PROCESS_BYTES
+        if info.format == "JPEG":
+            # Decodificado inteiro, mas já reduzido pelo draft
+            draft_width, draft_height = draft_size(info.size, output_size)
+            peak_bytes += draft_width * draft_height * 4 + strip_height * draft_width * 4
+        elif info.streams:
+            peak_bytes += max_in_flight * strip_height * info.width * 4
+        else:
+            # O processo principal decodifica a imagem inteira e corta as faixas dela
+            peak_bytes += source_pixels * 4 + strip_height * info.width * 4
+        return JobPlan(info, "tiled", output_size, workers, strip_height, max_in_flight,
+                       seconds=POOL_SECONDS + wall_seconds(cpu_seconds, workers + 1, cpu_seconds / workers),
+                       peak_bytes=peak_bytes)
+
+    if info.kind == "gif":
+        if workers <= 1 or frames <= GIF_CHUNK_FRAMES:
+            return JobPlan(info, "gif", output_size, 1, seconds=wall_seconds(cpu_seconds, 1),
+                           peak_bytes=PROCESS_BYTES + source_pixels * 4 + output_pixels * 3)
+        workers = min(workers, ceil(frames / GIF_CHUNK_FRAMES))
+        # Os chunks levam grades de índices e voltam codificados (no máximo cerca de um byte por pixel)
+        chunk_size, max_in_flight = plan_chunks(cells + output_pixels, workers, GIF_CHUNK_FRAMES, None, max_memory)
+        # O processo principal decodifica e reduz (o custo da fonte); renderização e codificação ficam com
+        # os processos
+        seconds = POOL_SECONDS + wall_seconds(cpu_seconds, workers + 1, max(source_seconds, cpu_seconds / workers))
+        peak_bytes = ((workers + 1) * PROCESS_BYTES + source_pixels * 4 + workers * output_pixels * 2
+                      + 2 * max_in_flight * chunk_size * (cells + output_pixels))
+        return JobPlan(info, "gif, parallel", output_size, workers, chunk_size, max_in_flight, seconds, peak_bytes)
+
+    # Vídeo: a codificação acontece em todos os modos no processo do ffmpeg (com várias threads),
+    # alimentado pelo processo principal; o mux só copia as faixas
+    encoder_bytes = ENCODER_BYTES + ENCODER_FRAMES * output_pixels * 3 // 2
+    mux_seconds = frames * MUX_SECONDS_PER_FRAME if info.audio else 0
+    scratch_bytes = int(frames * output_pixels * VIDEO_BYTES_PER_PIXEL)
+    if streaming:
+        return JobPlan(info, "video, streaming", output_size, 1,
+                       seconds=wall_seconds(cpu_seconds, 2, source_seconds) + mux_seconds,
+                       peak_bytes=PROCESS_BYTES + source_pixels * 4 + output_pixels * 3 + encoder_bytes,
+                       scratch_bytes=scratch_bytes)
+    if shared_memory:
+        slots = workers * 4
+        if max_memory != None:
+            slots = max(1, min(slots, max_memory // (source_pixels + cells)))
+        serial_seconds = max(source_seconds / 2, source_seconds / workers)
+        seconds = POOL_SECONDS + wall_seconds(cpu_seconds, workers + 2, serial_seconds) + mux_seconds
+        # Os slots guardam o frame em escala de cinza e a grade; o processo principal renderiza um frame por vez
+        peak_bytes = (workers + 1) * PROCESS_BYTES + slots * (source_pixels + cells) + output_pixels * 3 + encoder_bytes
+        return JobPlan(info, "video, shared memory", output_size, workers, None, slots, seconds, peak_bytes, scratch_bytes)
+
+    fps = info.fps or 30
+    chunk_size, max_in_flight = plan_chunks(cells, workers, max(1, round(fps * 5)), chunk_size, max_memory)
+    workers = max(1, min(workers, ceil(frames / chunk_size))) # Não adianta ter mais processos do que chunks
+    max_in_flight = min(max_in_flight, ceil(frames / chunk_size))
+    # Cada chunk pronto existe duas vezes (no processo e na cópia recebida), em grades de 1 byte por célula;
+    # o processo principal renderiza um frame por vez
+    seconds = POOL_SECONDS + wall_seconds(cpu_seconds, workers + 2, source_seconds / workers) + mux_seconds
+    peak_bytes = ((workers + 1) * PROCESS_BYTES + 2 * chunk_size * max_in_flight * cells + output_pixels * 3
+                  + workers * source_pixels * 4 + encoder_bytes)
+    return JobPlan(info, "video, parallel", output_size, workers, chunk_size, max_in_flight, seconds, peak_bytes, scratch_bytes)
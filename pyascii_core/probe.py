@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+from .grid_format import GridReader, is_grid_file
+from .tiled import open_unbounded, streams_source
+
+##### Media Probe #####
+# Abre a entrada uma única vez e devolve tudo o que o planner e os pipelines precisam saber:
+# tipo, tamanho, número de frames, fps, duração e se há áudio. Imagens e GIFs são lidos pelo
+# PIL (só o cabeçalho, sem o limite de pixels); vídeos por uma única VideoCapture, e o áudio
+# pelo cabeçalho que o ffmpeg lê do arquivo.
+
+class MediaInfo:
+    def __init__(self, path, kind, width, height, frames=1, fps=None, duration=None, audio=False, format=None, streams=False):
+        self.path = path
+        self.kind = kind # "image", "gif", "video" ou "grid" (.pyascii)
+        self.width = width
+        self.height = height
+        self.frames = frames # Pode ser só uma estimativa em vídeos (CAP_PROP_FRAME_COUNT)
+        self.fps = fps
+        self.duration = duration # Segundos (estimada em GIFs pela duração do primeiro frame)
+        self.audio = audio
+        self.format = format
+        self.streams = streams # Imagem que o modo tiled lê sem decodificar inteira (tiled.streams_source)
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    def __str__(self):
+        text = f"{self.kind} ({self.format}) {self.width}x{self.height}"
+        if self.kind != "image" and self.frames:
+            text += f", {self.frames} frames"
+        if self.fps:
+            text += f" at {self.fps:.2f} fps"
+        if self.duration:
+            text += f" ({self.duration:.2f} s)"
+        if self.kind == "video":
+            text += ", with audio" if self.audio else ", no audio"
+        return text
+
+def probe_image(path, image):
+    if image.format != "GIF":
+        return MediaInfo(path, "image", image.width, image.height, format=image.format, streams=streams_source(image))
+    # n_frames só lê os cabeçalhos; o seek decodificaria cada frame. A duração é estimada pela
+    # do primeiro frame, que é a mesma em quase todos os GIFs
+    frames = image.n_frames
+    image.seek(0)
+    duration = frames * image.info.get("duration", 0) / 1000
+    fps = frames / duration if duration else None
+    return MediaInfo(path, "gif", image.width, image.height, frames, fps, duration, format="GIF")
+
+def probe_video(path):
+    import cv2
+    from .audio_mux import has_audio
+
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            return None
+        width, height = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        video_format = cap.getBackendName()
+    finally:
+        cap.release()
+    duration = frames / fps if fps else None
+    return MediaInfo(path, "video", width, height, frames, fps, duration, has_audio(path), video_format)
+
+def probe_grid(path):
+    with GridReader(path) as reader:
+        metadata = reader.metadata
+    width, height = metadata["output_size"]
+    return MediaInfo(path, "grid", width, height, frames=None, fps=metadata["fps"], format=metadata["source"]["type"])
+
+# Devolve um MediaInfo, ou None se a entrada não é uma mídia suportada
+def probe_media(path):
+    if is_grid_file(path):
+        return probe_grid(path)
+    try:
+        with open_unbounded(path) as image:
+            return probe_image(path, image)
+    except (IOError, SyntaxError):
+        pass
+    return probe_video(path)
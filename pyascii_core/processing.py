@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+from PIL import Image
+from math import ceil
+import shutil
+import os
+from .renderer import render_frame, IncrementalRenderer
+from .sprites import palette_image
+from .gif_writer import GifWriter
+from .gif_pipeline import GifStats, decode_gif, changed_region, gif_palette, transparent_index, parallel_gif
+from .grid_format import GRID_EXTENSION, save_image_grid, save_gif_grid
+from .paths import default_output, default_workers, scratch_job
+from .profiling import span
+from .progress import report
+from .planner import GIF_CHUNK_FRAMES, plan_job
+
+# O OpenCV, o moviepy e o pipeline de vídeo só são importados quando um vídeo é processado,
+# então converter uma imagem ou um GIF carrega apenas o PIL e o numpy.
+
+#### Image Tools ####
+
+def image_processing(image_name, resolution, high_contrast, atlas, palette, output_file, sampling="area"):
+    if output_file != None and output_file.endswith(GRID_EXTENSION):
+        # Salva somente a grade de índices (.pyascii), que pode ser renderizada depois em qualquer filtro
+        save_image_grid(image_name, output_file, resolution, high_contrast, atlas.shape[2], atlas.shape[1], sampling)
+        return
+
+    with span("decode"):
+        image = Image.open(image_name).convert("L")
+    with span("convert"):
+        output_image = palette_image(render_frame(image, atlas, resolution, high_contrast, sampling), palette)
+
+    # Salva a imagem final como png (com a paleta do filtro)
+    with span("encode"):
+        if output_file != None:
+            output_image.save(f"{output_file}")
+        else:
+            output_image.save(default_output("PyAscii_image.png"))
+    report(1, 1)
+
+##### GIF Tools #####
+
+# max_memory (bytes) limita a memória dos chunks em andamento na conversão em vários processos
+def gif_processing(gif_name, resolution, high_contrast, atlas, palette, output_file, sampling="area", workers=None, max_memory=None):
+    if output_file != None and output_file.endswith(GRID_EXTENSION):
+        save_gif_grid(gif_name, output_file, resolution, high_contrast, atlas.shape[2], atlas.shape[1], sampling)
+        return
+
+    if output_file == None:
+        output_file = default_output("PyAscii_gif.gif")
+    if workers == None:
+        workers = default_workers()
+
+    with Image.open(gif_name) as gif:
+        # GIFs longos são convertidos e codificados em vários processos, em chunks de frames;
+        # como no planner, não adianta ter mais processos do que chunks
+        if workers > 1 and gif.n_frames > GIF_CHUNK_FRAMES:
+            workers = min(workers, ceil(gif.n_frames / GIF_CHUNK_FRAMES))
+            return parallel_gif(gif, output_file, atlas, palette, resolution, high_contrast, sampling, workers, max_memory=max_memory)
+
+        # Cada frame é convertido e gravado em seguida; só um frame fica em memória por vez.
+        # O renderer redesenha apenas as células que mudaram desde o frame anterior.
+        # Cada frame guarda só a região que mudou em relação ao anterior.
+        renderer = IncrementalRenderer(atlas)
+        transparency = transparent_index(palette)
+        palette = gif_palette(palette)
+        previous_disposal = None
+        with GifWriter(output_file, loop=gif.info.get("loop"), fixed_palette=True, transparency=transparency) as writer:
+            for number, (pixels, duration, disposal) in enumerate(decode_gif(gif)):
+                with span("convert", frame=number):
+                    canvas = renderer.render_image(Image.fromarray(pixels), resolution, high_contrast, sampling)
+                with span("encode", frame=number):
+                    region, offset = changed_region(canvas, renderer, previous_disposal, transparency)
+                    writer.write_frame(palette_image(region, palette), duration, disposal, offset)
+                previous_disposal = disposal
+                report(number + 1, gif.n_frames)
+        return GifStats(renderer.stats, writer.stats)
+
+
+##### Video Tools #####
+
+# info é o MediaInfo do vídeo (probe_media); se não for passado, o vídeo é aberto para obtê-lo.
+# O planner escolhe o número de processos e o tamanho dos chunks, os mesmos mostrados no --dry-run.
+def video_processing(video_name, resolution, high_contrast, atlas, palette, output_file, sampling="area", streaming=False, chunk_size=None, workers=None, shared_memory=False, max_memory=None, info=None):
+    if output_file != None and output_file.endswith(GRID_EXTENSION):
+        from .grid_format import save_video_grid
+        save_video_grid(video_name, output_file, resolution, high_contrast, atlas.shape[2], atlas.shape[1], sampling)
+        return
+
+    from .video_pipeline import stream_video, parallel_video, shared_memory_video
+    from .audio_mux import mux_audio
+    from .probe import probe_video
+
+    info = info or probe_video(video_name)
+    if info == None:
+        raise ValueError(f"Could not open '{video_name}' as a video!")
+    plan = plan_job(info, resolution, workers, chunk_size, max_memory, streaming, shared_memory)
+
+    if output_file == None:
+        final_output_path = default_output("PyASCII.mp4")
+    else:
+        final_output_path = output_file
+
+    # O vídeo sem áudio fica na pasta temporária desta conversão, apagada mesmo se algo falhar
+    with scratch_job("video", plan.scratch_bytes) as scratch:
+        output_video_path = os.path.join(scratch, "noaudio.mp4")
+
+        if streaming:
+            # Decodifica e codifica o vídeo uma única vez, sem arquivos temporários
+            stats = stream_video(video_name, output_video_path, atlas, palette, resolution, high_contrast, sampling, info)
+        elif shared_memory:
+            # Um decodificador e vários processos reduzindo frames, trocados pela memória compartilhada
+            stats = shared_memory_video(video_name, output_video_path, atlas, palette, resolution, high_contrast, sampling, plan.workers, max_memory, info)
+        else:
+            # Vários processos, cada um decodificando um intervalo de frames do vídeo original
+            stats = parallel_video(video_name, output_video_path, atlas, palette, resolution, high_contrast, sampling,
+                                   plan.chunk_size, plan.workers, max_memory, info)
+
+        # Copia o áudio original e o vídeo ASCII para o container final, sem recodificar;
+        # sem áudio na fonte, o vídeo só é movido para o destino
+        with span("mux"):
+            if info.audio:
+                mux_audio(output_video_path, video_name, final_output_path)
+            else:
+                shutil.move(output_video_path, final_output_path)
+    return stats
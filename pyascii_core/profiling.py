@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+from time import perf_counter_ns
+import threading
+import json
+import os
+from .paths import make_scratch_dir, remove_scratch_dir
+
+##### Profiling #####
+# span("etapa", frame=..., chunk=...) mede um trecho do pipeline. Com o profiling desligado,
+# span() devolve sempre o mesmo objeto vazio, então o custo é só o da chamada.
+# Com --profile, cada processo (o principal e os processos dos pools) grava os seus eventos em um
+# arquivo próprio dentro de uma pasta temporária; no final os arquivos são juntados em um trace no
+# formato do Chrome (chrome://tracing, Perfetto) e em uma tabela com o tempo de cada etapa.
+# A pasta é passada aos processos pela variável de ambiente PYASCII_PROFILE, que vale tanto para
+# fork quanto para spawn. perf_counter usa o relógio monotônico do sistema, o mesmo em todos os processos.
+
+PROFILE_ENV = "PYASCII_PROFILE"
+
+trace_dir = os.environ.get(PROFILE_ENV) or None
+trace_file = None
+trace_pid = None
+
+class NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return None
+
+NULL_SPAN = NullSpan()
+
+class Span:
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        record(self.name, self.start, perf_counter_ns() - self.start, self.args)
+        return None
+
+def span(name, **args):
+    if trace_dir is None:
+        return NULL_SPAN
+    return Span(name, args)
+
+# Grava um evento no arquivo deste processo. O arquivo é reaberto depois de um fork, e cada linha
+# vai direto para o disco, já que os processos dos pools podem ser encerrados sem aviso.
+def record(name, start, duration, args):
+    global trace_file, trace_pid
+    if trace_pid != os.getpid():
+        trace_pid = os.getpid()
+        trace_file = open(os.path.join(trace_dir, f"{trace_pid}.jsonl"), "a", buffering=1)
+    trace_file.write(json.dumps([name, start, duration, threading.get_native_id(), args]) + "\n")
+
+#### Trace Export ####
+
+class ProfileReport:
+    def __init__(self, trace_path, stages, wall):
+        self.trace_path = trace_path
+        self.stages = stages # Nome -> (chamadas, total em ns, maior duração em ns, processos)
+        self.wall = wall
+
+    def __str__(self):
+        lines = [f"{'stage':<18}{'calls':>8}{'total ms':>11}{'mean ms':>10}{'max ms':>9}{'processes':>11}{'% of wall':>11}"]
+        for name, (calls, total, longest, processes) in sorted(self.stages.items(), key=lambda item: -item[1][1]):
+            share = total / self.wall if self.wall else 0
+            lines.append(f"{name:<18}{calls:>8}{total / 1e6:>11.1f}{total / calls / 1e6:>10.2f}{longest / 1e6:>9.2f}"
+                         f"{processes:>11}{share:>11.1%}")
+        lines.append(f"Trace written to {self.trace_path} (open it in chrome://tracing or ui.perfetto.dev)")
+        return "\n".join(lines)
+
+# Liga o profiling neste processo e nos processos criados a partir daqui
+def start_profile():
+    global trace_dir
+    trace_dir = make_scratch_dir("profile")
+    os.environ[PROFILE_ENV] = trace_dir
+    return perf_counter_ns()
+
+# Junta os eventos de todos os processos em um trace do Chrome e devolve o resumo por etapa
+def finish_profile(output_file, started):
+    global trace_dir, trace_file, trace_pid
+    wall = perf_counter_ns() - started
+    if trace_file is not None:
+        trace_file.close()
+    directory, trace_dir, trace_file, trace_pid = trace_dir, None, None, None
+    os.environ.pop(PROFILE_ENV, None)
+
+    main_pid = os.getpid()
+    events = []
+    stages = {}
+    processes = {}
+    for file_name in sorted(os.listdir(directory)):
+        if not file_name.endswith(".jsonl"):
+            continue # Arquivo de trava da pasta
+        pid = int(file_name.split(".")[0])
+        with open(os.path.join(directory, file_name)) as file:
+            for line in file:
+                try:
+                    name, start, duration, tid, args = json.loads(line)
+                except ValueError:
+                    continue # Linha cortada por um processo encerrado no meio da escrita
+                events.append({"name": name, "ph": "X", "ts": (start - started) / 1000, "dur": duration / 1000,
+                               "pid": pid, "tid": tid, "args": args})
+                calls, total, longest, pids = stages.get(name, (0, 0, 0, set()))
+                pids.add(pid)
+                stages[name] = (calls + 1, total + duration, max(longest, duration), pids)
+        processes[pid] = "main" if pid == main_pid else f"worker {pid}"
+    remove_scratch_dir(directory)
+
+    for pid, process_name in processes.items():
+        events.append({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": process_name}})
+    with open(output_file, "w") as file:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+    stages = {name: (calls, total, longest, len(pids)) for name, (calls, total, longest, pids) in stages.items()}
+    return ProfileReport(output_file, stages, wall)
@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+
+##### Progress #####
+# As conversões chamam report(feitos, total) a cada frame (ou faixa) gravado no processo principal.
+# Quem roda a conversão (a GUI) instala um hook com set_progress_hook; o hook pode levantar
+# Cancelled para interromper a conversão, que sai pelos mesmos caminhos de um erro: os pools são
+# encerrados e os arquivos abertos são fechados. Sem hook, report() não faz nada.
+
+progress_hook = None
+
+class Cancelled(Exception):
+    pass
+
+def set_progress_hook(hook):
+    global progress_hook
+    progress_hook = hook
+
+# total = None quando o número de frames não é conhecido
+def report(done, total=None):
+    if progress_hook is not None:
+        progress_hook(done, total)
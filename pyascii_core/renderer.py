@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+
+from PIL import Image
+import numpy as np
+
+# Modos de amostragem da grade de células:
+#   area  -> redimensiona direto para (largura/8, altura/8) com filtro BOX (média da área de cada célula)
+#   point -> modo legado: LANCZOS na resolução final e leitura do pixel do canto superior esquerdo de cada célula
+SAMPLING_MODES = ("area", "point")
+
+# Tabela com o índice do sprite (0 a 16) para cada valor de pixel (0 a 255)
+GLYPH_LUT = np.array([int((value / 255) * 16) for value in range(256)], dtype=np.uint8)
+
+# Modos do contraste (-c). A equalização do histograma vira uma tabela de 256 valores que é
+# combinada com a GLYPH_LUT, então o contraste custa só um histograma da grade por frame:
+#   scene   -> a tabela é reaproveitada entre os frames até uma mudança de cena (sem tremulação)
+#   running -> a tabela acompanha um histograma médio dos últimos frames, e recomeça em cada cena
+#   frame   -> modo legado: cada frame é equalizado sozinho (o brilho pode oscilar entre frames)
+CONTRAST_MODES = ("scene", "running", "frame")
+DEFAULT_CONTRAST = "scene"
+SCENE_CHANGE = 0.25 # Fração do histograma que precisa mudar para contar como uma nova cena
+RUNNING_WEIGHT = 0.1 # Peso de cada frame novo no histograma médio
+
+# Caractere mais parecido com cada sprite da sprite sheet, usado nas saídas em texto
+GLYPH_CHARS = " .,:;rop%$ae@A0&#"
+GLYPH_BYTES = np.frombuffer(GLYPH_CHARS.encode("ascii"), dtype=np.uint8)
+
+#### Image Tools ####
+
+# Calcula a resolução de saída sem perder a proporção
+def scaled_size(size, ref_size):
+    rows, cols = size
+    if rows < cols:
+        cols = int((cols / rows) * ref_size)
+        rows = ref_size
+    elif rows == cols:
+        cols = ref_size
+        rows = ref_size
+    else:
+        rows = int((rows / cols) * ref_size)
+        cols = ref_size
+    return rows, cols
+
+# Tamanho da grade de células (colunas, linhas) para um tamanho de saída
+def grid_size(output_size, sprite_width, sprite_height):
+    output_width, output_height = output_size
+    return -(-output_width // sprite_width), -(-output_height // sprite_height)
+
+# Converte um frame BGR do OpenCV para escala de cinza ("L") com a conversão do PIL, a mesma das
+# imagens e GIFs, para que todos os modos de vídeo (e a prévia) gerem os mesmos frames
+def gray_image(frame):
+    height, width = frame.shape[:2]
+    return Image.frombuffer("RGB", (width, height), np.ascontiguousarray(frame), "raw", "BGR", 0, 1).convert("L")
+
+# Muda a resolução da imagem sem perder a proporção
+def resize_image(image, ref_size):
+    return image.resize(scaled_size(image.size, ref_size), Image.LANCZOS)
+
+#### Contrast ####
+
+# high_contrast pode ser True (modo padrão), False/None ou um dos CONTRAST_MODES
+def contrast_mode(high_contrast):
+    if not high_contrast:
+        return None
+    return DEFAULT_CONTRAST if high_contrast is True else high_contrast
+
+# Tabela de equalização de um histograma de 256 posições, com a mesma conta do ImageOps.equalize
+def equalize_lut(histogram):
+    used = histogram[histogram > 0]
+    if len(used) <= 1:
+        return np.arange(256, dtype=np.uint8)
+    step = (used.sum() - used[-1]) // 255
+    if not step:
+        return np.arange(256, dtype=np.uint8)
+    below = np.concatenate(([0], np.cumsum(histogram)[:-1]))
+    return np.minimum((step // 2 + below) // step, 255).astype(np.uint8)
+
+# Guarda a tabela de contraste (já combinada com a GLYPH_LUT) entre os frames de uma sequência
+class ContrastEqualizer:
+    def __init__(self, mode=DEFAULT_CONTRAST):
+        self.mode = mode
+        self.histogram = None # Histograma da cena atual (no modo running, a média dos frames)
+        self.glyph_lut = None
+        self.pixels = 0
+        self.updates = 0
+
+    def is_scene_change(self, histogram):
+        pixels = histogram.sum()
+        if self.histogram is None or pixels != self.pixels:
+            return True
+        return np.abs(histogram - self.histogram).sum() / (2 * pixels) > SCENE_CHANGE
+
+    # Recebe o histograma do frame e devolve a tabela valor do pixel -> índice do sprite
+    def lut(self, histogram):
+        if self.mode == "frame" or self.is_scene_change(histogram):
+            self.histogram = histogram.astype(np.float64)
+            self.pixels = histogram.sum()
+        elif self.mode == "running":
+            self.histogram += (histogram - self.histogram) * RUNNING_WEIGHT
+        else:
+            return self.glyph_lut
+        self.glyph_lut = GLYPH_LUT[equalize_lut(self.histogram)]
+        self.updates += 1
+        return self.glyph_lut
+
+# Tabela de índices de sprite para os pixels; pixels é o array de onde sai o histograma
+# (ou histogram, se o histograma já foi calculado de outro array)
+def glyph_lut(pixels, high_contrast, equalizer=None, histogram=None):
+    if not high_contrast:
+        return GLYPH_LUT
+    if equalizer is None:
+        equalizer = ContrastEqualizer(contrast_mode(high_contrast))
+    if histogram is None:
+        histogram = np.bincount(pixels.ravel(), minlength=256)
+    return equalizer.lut(histogram)
+
+#### Rendering Engine ####
+
+# Converte uma imagem em escala de cinza ("L") na grade de índices de sprite e no tamanho de saída.
+# equalizer guarda o contraste entre os frames de uma sequência (sem ele cada frame é equalizado sozinho).
+def image_to_indices(image, resolution, high_contrast, sprite_width, sprite_height, sampling="area", equalizer=None):
+    cells, histogram, output_size = image_to_cells(image, resolution, sprite_width, sprite_height, sampling, high_contrast)
+    return cells_to_indices(cells, high_contrast, equalizer, histogram), output_size
+
+# Primeira metade do image_to_indices: reduz a imagem à grade de células (um valor de cinza por célula)
+# e devolve (células, histograma, tamanho de saída). Não depende dos frames anteriores, então pode rodar
+# em qualquer processo e em qualquer ordem; o contraste é aplicado depois, em ordem, por cells_to_indices.
+# O histograma só é devolvido quando não sai das próprias células (amostragem point com contraste).
+def image_to_cells(image, resolution, sprite_width, sprite_height, sampling="area", high_contrast=None):
+    output_width, output_height = scaled_size(image.size, resolution)
+
+    if sampling == "point":
+        # A equalização usa o histograma da imagem inteira, mas só os pixels amostrados passam pela tabela
+        pixels = np.asarray(image.resize((output_width, output_height), Image.LANCZOS))
+        histogram = np.bincount(pixels.ravel(), minlength=256) if high_contrast else None
+        return pixels[::sprite_height, ::sprite_width].copy(), histogram, (output_width, output_height)
+
+    cells = image.resize(grid_size((output_width, output_height), sprite_width, sprite_height), Image.BOX)
+    return np.asarray(cells), None, (output_width, output_height)
+
+# Converte a imagem já reduzida à grade (um pixel por célula, modo "L") nos índices de sprite
+def cells_to_indices(cells, high_contrast, equalizer=None, histogram=None):
+    cells = np.asarray(cells)
+    return glyph_lut(cells, high_contrast, equalizer, histogram)[cells]
+
+# Monta o frame inteiro de uma vez a partir da grade de índices. O atlas tem formato
+# (sprites, altura, largura) e guarda índices de cor; o resultado é um canvas de índices
+# de paleta (uint8), que só recebe as cores do filtro na hora de salvar/codificar.
+# Se `out` for passado (com o tamanho completo da grade), o frame é escrito direto nele.
+def render_indices(indices, atlas, output_size, out=None):
+    rows, cols = indices.shape
+    _, sprite_height, sprite_width = atlas.shape
+    output_width, output_height = output_size
+
+    tiles = atlas[indices].transpose(0, 2, 1, 3) # (linhas, altura, colunas, largura)
+    if out is not None:
+        out.reshape(rows, sprite_height, cols, sprite_width)[...] = tiles
+        return out[:output_height, :output_width]
+
+    frame = tiles.reshape(rows * sprite_height, cols * sprite_width)
+
+    # Os sprites da borda são cortados, assim como acontecia com o paste()
+    if frame.shape[0] != output_height or frame.shape[1] != output_width:
+        frame = np.ascontiguousarray(frame[:output_height, :output_width])
+    return frame
+
+# Converte a grade de índices em texto, um caractere por célula
+def indices_to_text(indices):
+    lines = np.empty((indices.shape[0], indices.shape[1] + 1), dtype=np.uint8)
+    lines[:, :-1] = GLYPH_BYTES[indices]
+    lines[:, -1] = ord("\n")
+    return lines.tobytes().decode("ascii")
+
+def render_frame(image, atlas, resolution, high_contrast, sampling="area"):
+    _, sprite_height, sprite_width = atlas.shape
+    indices, output_size = image_to_indices(image, resolution, high_contrast, sprite_width, sprite_height, sampling)
+    return render_indices(indices, atlas, output_size)
+
+#### Incremental Rendering ####
+
+# Contadores de reaproveitamento de células e frames (e de chunks lidos do cache de chunks)
+class ReuseStats:
+    def __init__(self):
+        self.cells = 0
+        self.cells_reused = 0
+        self.frames = 0
+        self.frames_reused = 0
+        self.chunks = 0
+        self.chunks_cached = 0
+
+    def add(self, other):
+        self.cells += other.cells
+        self.cells_reused += other.cells_reused
+        self.frames += other.frames
+        self.frames_reused += other.frames_reused
+        self.chunks += other.chunks
+        self.chunks_cached += other.chunks_cached
+
+    def __str__(self):
+        cell_ratio = self.cells_reused / self.cells if self.cells else 0
+        frame_ratio = self.frames_reused / self.frames if self.frames else 0
+        text = (f"Reused {self.cells_reused}/{self.cells} cells ({cell_ratio:.1%}) "
+                f"and {self.frames_reused}/{self.frames} frames ({frame_ratio:.1%})")
+        if self.chunks:
+            text += f", {self.chunks_cached}/{self.chunks} chunks from the chunk cache"
+        return text
+
+# Compara a grade de índices com a do frame anterior e redesenha somente as células que mudaram.
+# Se nada mudou o buffer anterior é devolvido como está. O frame devolvido é uma view do buffer
+# interno, válida somente até a próxima chamada de render().
+# dirty_box guarda a região (esquerda, topo, direita, base) em pixels que mudou no último frame,
+# ou None se o frame é idêntico ao anterior.
+class IncrementalRenderer:
+    # Acima dessa fração de células alteradas é mais rápido montar o frame inteiro
+    full_render_ratio = 0.5
+
+    def __init__(self, atlas):
+        self.atlas = atlas
+        self.stats = ReuseStats()
+        self.indices = None
+        self.previous_indices = None # Grade do frame anterior, para comparar os pixels da região alterada
+        self.output_size = None
+        self.buffer = None
+        self.frame = None
+        self.frame_reused = False
+        self.dirty_box = None
+        self.equalizer = None
+
+    def render(self, indices, output_size):
+        rows, cols = indices.shape
+        _, sprite_height, sprite_width = self.atlas.shape
+        self.stats.frames += 1
+        self.stats.cells += indices.size
+        self.frame_reused = False
+
+        if self.indices is None or self.indices.shape != indices.shape or self.output_size != output_size:
+            self.buffer = np.empty((rows * sprite_height, cols * sprite_width), dtype=self.atlas.dtype)
+            self.output_size = output_size
+            self.frame = render_indices(indices, self.atlas, output_size, out=self.buffer)
+            self.dirty_box = (0, 0) + output_size
+        else:
+            changed_rows, changed_cols = np.nonzero(indices != self.indices)
+            changed = len(changed_rows)
+            if changed == 0:
+                self.frame_reused = True
+                self.dirty_box = None
+                self.stats.frames_reused += 1
+                self.stats.cells_reused += indices.size
+                return self.frame
+            output_width, output_height = output_size
+            self.dirty_box = (changed_cols.min() * sprite_width, changed_rows.min() * sprite_height,
+                              min((changed_cols.max() + 1) * sprite_width, output_width),
+                              min((changed_rows.max() + 1) * sprite_height, output_height))
+            if changed > indices.size * self.full_render_ratio:
+                render_indices(indices, self.atlas, output_size, out=self.buffer)
+            else:
+                tiles = self.buffer.reshape(rows, sprite_height, cols, sprite_width)
+                tiles[changed_rows, :, changed_cols] = self.atlas[indices[changed_rows, changed_cols]]
+            self.stats.cells_reused += indices.size - changed
+
+        self.previous_indices = self.indices
+        self.indices = indices
+        return self.frame
+
+    # Aplica o contraste (mantido entre as chamadas) a uma grade de image_to_cells e renderiza
+    def render_cells(self, cells, output_size, high_contrast, histogram=None):
+        mode = contrast_mode(high_contrast)
+        if mode != None and (self.equalizer is None or self.equalizer.mode != mode):
+            self.equalizer = ContrastEqualizer(mode)
+        return self.render(cells_to_indices(cells, high_contrast, self.equalizer, histogram), output_size)
+
+    def render_image(self, image, resolution, high_contrast, sampling="area"):
+        _, sprite_height, sprite_width = self.atlas.shape
+        cells, histogram, output_size = image_to_cells(image, resolution, sprite_width, sprite_height, sampling, high_contrast)
+        return self.render_cells(cells, output_size, high_contrast, histogram)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+from PIL import Image
+from multiprocessing import Process, Queue
+from multiprocessing.shared_memory import SharedMemory
+from queue import Empty
+import numpy as np
+import cv2
+from .profiling import span
+from .renderer import scaled_size, grid_size, gray_image, image_to_cells
+
+##### Shared Memory Transport #####
+# O decodificador escreve os frames em escala de cinza em um anel de slots na memória compartilhada,
+# os processos escrevem a grade de células do frame (e o histograma, quando ele não sai das células)
+# no slot correspondente do anel de células. Pelas filas passam apenas (número do frame, slot); nada
+# de pickle de frames nem arquivos temporários. O contraste depende dos frames anteriores, então ele
+# é aplicado por quem recebe as grades, em ordem.
+
+def create_shared_array(shape, dtype=np.uint8):
+    size = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+    shm = SharedMemory(create=True, size=size)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+def attach_shared_array(name, shape, dtype=np.uint8, readonly=False):
+    shm = SharedMemory(name=name)
+    array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    if readonly:
+        array.flags.writeable = False
+    return shm, array
+
+def release_shared_arrays(blocks, unlink=False):
+    for shm in blocks:
+        shm.close()
+        if unlink:
+            shm.unlink()
+
+def reduce_worker(spec, tasks, done):
+    gray_shm, gray_ring = attach_shared_array(spec["gray"], spec["gray_shape"])
+    cells_shm, cells_ring = attach_shared_array(spec["cells"], spec["cells_shape"])
+    histogram_shm, histogram_ring = attach_shared_array(spec["histograms"], spec["histograms_shape"], np.int64)
+    _, sprite_height, sprite_width = spec["atlas_shape"]
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            frame_number, slot = task
+            with span("reduce", frame=frame_number):
+                image = Image.fromarray(gray_ring[slot])
+                cells, histogram, _ = image_to_cells(image, spec["resolution"], sprite_width, sprite_height,
+                                                     spec["sampling"], spec["high_contrast"])
+                cells_ring[slot] = cells
+                if histogram is not None:
+                    histogram_ring[slot] = histogram
+            done.put((frame_number, slot))
+    finally:
+        # As views precisam sair de escopo antes de fechar a memória compartilhada
+        del gray_ring, cells_ring, histogram_ring
+        release_shared_arrays([gray_shm, cells_shm, histogram_shm])
+
+# Espera um frame reduzido, verificando se algum processo morreu no caminho
+def wait_done(done, procs):
+    while True:
+        try:
+            return done.get(timeout=1)
+        except Empty:
+            if not all(proc.is_alive() for proc in procs):
+                raise RuntimeError("A shared-memory worker exited unexpectedly.")
+
+# Gera (células, histograma, tamanho de saída) de cada frame, na ordem do vídeo, como o image_to_cells
+def shared_memory_cells(video_name, atlas_shape, resolution, high_contrast, sampling="area", workers=1, slots=None):
+    cap = cv2.VideoCapture(video_name)
+    ret, frame = cap.read()
+    if not ret:
+        cap.release()
+        return
+
+    if slots is None:
+        slots = workers * 4
+    _, sprite_height, sprite_width = atlas_shape
+    source_height, source_width = frame.shape[:2]
+    output_size = scaled_size((source_width, source_height), resolution)
+    cols, rows = grid_size(output_size, sprite_width, sprite_height)
+    with_histogram = sampling == "point" and bool(high_contrast)
+
+    gray_shm, gray_ring = create_shared_array((slots, source_height, source_width))
+    cells_shm, cells_ring = create_shared_array((slots, rows, cols))
+    histogram_shm, histogram_ring = create_shared_array((slots, 256), np.int64)
+
+    spec = {"atlas_shape": atlas_shape,
+            "gray": gray_shm.name, "gray_shape": gray_ring.shape,
+            "cells": cells_shm.name, "cells_shape": cells_ring.shape,
+            "histograms": histogram_shm.name, "histograms_shape": histogram_ring.shape,
+            "resolution": resolution, "high_contrast": high_contrast, "sampling": sampling}
+    tasks, done = Queue(), Queue()
+    procs = [Process(target=reduce_worker, args=(spec, tasks, done), daemon=True) for _ in range(workers)]
+    for proc in procs:
+        proc.start()
+
+    try:
+        free_slots = list(range(slots))
+        ready = {}
+        submitted = 0
+        next_frame = 0
+        while True:
+            # Decodifica enquanto houver slots livres
+            while free_slots and frame is not None:
+                slot = free_slots.pop()
+                gray_ring[slot] = gray_image(frame)
+                tasks.put((submitted, slot))
+                submitted += 1
+                with span("decode", frame=submitted):
+                    ret, frame = cap.read()
+                if not ret:
+                    frame = None
+
+            if next_frame == submitted:
+                break
+
+            with span("wait frame", frame=next_frame):
+                frame_number, slot = wait_done(done, procs)
+            ready[frame_number] = slot
+            # Entrega as grades em ordem. A cópia (pequena) permite liberar o slot (e a memória
+            # compartilhada no final) sem depender do consumidor.
+            while next_frame in ready:
+                slot = ready.pop(next_frame)
+                cells = cells_ring[slot].copy()
+                histogram = histogram_ring[slot].copy() if with_histogram else None
+                free_slots.append(slot)
+                next_frame += 1
+                yield cells, histogram, output_size
+    finally:
+        cap.release()
+        for _ in procs:
+            tasks.put(None)
+        for proc in procs:
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+        del gray_ring, cells_ring, histogram_ring
+        release_shared_arrays([gray_shm, cells_shm, histogram_shm], unlink=True)
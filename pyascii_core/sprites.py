@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+from PIL import Image
+from functools import lru_cache
+import numpy as np
+import tomllib
+import hashlib
+import io
+import os
+from .paths import SPRITE_SHEET, FILTERS_FILE, cache_dir
+
+WHITE = (255, 255, 255, 255)
+
+# Os arquivos lidos são memorizados pelo caminho, data de modificação e tamanho,
+# então qualquer alteração em sprite_sheet.png ou filters.toml é lida de novo
+def file_signature(path):
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+def load_filters():
+    return read_filters(file_signature(FILTERS_FILE))
+
+@lru_cache(maxsize=8)
+def read_filters(signature):
+    with open(signature[0], 'rb') as file:
+        filters = tomllib.load(file)
+    return filters
+
+#### Sprites & Palettes ####
+# Os sprites não guardam cores: o atlas guarda, para cada pixel, o índice da cor na sprite sheet.
+# O filtro vira apenas uma paleta aplicada na saída, então trocar de filtro não exige redesenhar nada.
+
+# Separa a sprite sheet em um atlas (sprites, altura, largura) de índices de cor e na lista de cores RGBA da sheet
+def load_atlas(sprite_sheet_image, sprite_width, sprite_height):
+    pixels = np.asarray(sprite_sheet_image.convert("RGBA"))
+    colors, color_indices = np.unique(pixels.reshape(-1, 4), axis=0, return_inverse=True)
+    if len(colors) > 256:
+        raise ValueError(f"The sprite sheet has {len(colors)} colors, at most 256 are supported!")
+
+    sheet = color_indices.reshape(pixels.shape[:2]).astype(np.uint8)
+    rows = sheet.shape[0] // sprite_height
+    cols = sheet.shape[1] // sprite_width
+    sheet = sheet[:rows * sprite_height, :cols * sprite_width]
+    atlas = sheet.reshape(rows, sprite_height, cols, sprite_width).transpose(0, 2, 1, 3)
+    return np.ascontiguousarray(atlas.reshape(rows * cols, sprite_height, sprite_width)), colors
+
+# Paleta RGB para as cores da sheet: sem filtro as cores originais são usadas;
+# com filtro o branco vira a primeira cor do filtro e o resto vira a segunda
+def filter_palette(colors, monochrome_filter=None):
+    if monochrome_filter == None:
+        return np.ascontiguousarray(colors[:, :3], dtype=np.uint8)
+
+    filters = load_filters()
+    if monochrome_filter not in filters:
+        raise KeyError(f"'{monochrome_filter}' is not recognized as a filter!")
+
+    foreground, background = filters[monochrome_filter]
+    is_white = np.all(colors == WHITE, axis=1)
+    return np.where(is_white[:, None], foreground, background).astype(np.uint8)
+
+# Converte um canvas de índices em RGB (usado pelo encoder de vídeo)
+def apply_palette(canvas, palette):
+    return palette[canvas]
+
+# Converte um canvas de índices em uma imagem "P" com a paleta do filtro
+def palette_image(canvas, palette):
+    image = Image.fromarray(canvas, "P")
+    image.putpalette(palette.tobytes())
+    return image
+
+#### Atlas Cache ####
+# O atlas pronto fica salvo em .npy no cache, com a chave formada pelo hash do conteúdo da sprite sheet
+# e pelo tamanho dos sprites, e é aberto com memory-map nas execuções seguintes. O filtro não faz
+# parte do atlas (ele é só a paleta, montada na hora a partir de filters.toml).
+
+ATLAS_CACHE_VERSION = 1 # Muda quando o formato do atlas muda, invalidando os arquivos antigos
+
+@lru_cache(maxsize=8)
+def cached_atlas(signature, sprite_width, sprite_height):
+    with open(signature[0], "rb") as file:
+        sheet = file.read()
+    key = f"{hashlib.sha256(sheet).hexdigest()[:32]}_{sprite_width}x{sprite_height}_v{ATLAS_CACHE_VERSION}"
+
+    directory = None
+    try:
+        directory = cache_dir("atlas")
+        atlas = np.asarray(np.load(os.path.join(directory, f"{key}_atlas.npy"), mmap_mode="r"))
+        colors = np.load(os.path.join(directory, f"{key}_colors.npy"))
+        return atlas, colors
+    except (OSError, ValueError):
+        pass
+
+    atlas, colors = load_atlas(Image.open(io.BytesIO(sheet)), sprite_width, sprite_height)
+    if directory is not None:
+        try:
+            save_array(os.path.join(directory, f"{key}_colors.npy"), colors)
+            save_array(os.path.join(directory, f"{key}_atlas.npy"), atlas)
+        except OSError:
+            pass # Sem cache gravável o atlas é apenas montado a cada execução
+    atlas.flags.writeable = False # O mesmo atlas memorizado é compartilhado por todas as chamadas
+    return atlas, colors
+
+# Grava em um arquivo temporário e renomeia, para que outro processo nunca leia um .npy pela metade
+def save_array(path, array):
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as file:
+        np.save(file, array)
+    os.replace(temp_path, path)
+
+# Atlas, cores da sheet e paleta do filtro, tudo o que é preciso para renderizar
+def load_sprites(monochrome_filter=None, sprite_sheet=SPRITE_SHEET, sprite_width=8, sprite_height=8):
+    atlas, colors = cached_atlas(file_signature(sprite_sheet), sprite_width, sprite_height)
+    return atlas, colors, filter_palette(colors, monochrome_filter)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+from time import perf_counter, sleep
+import numpy as np
+import sys
+from .renderer import gray_image, image_to_indices, indices_to_text, contrast_mode, ContrastEqualizer
+from .sprites import WHITE
+from .grid_format import GridReader, is_grid_file
+
+##### Real-Time Terminal Playback #####
+# Mostra os frames como texto no terminal, usando a mesma grade de índices do renderer.
+# O ritmo segue o fps da fonte: cada frame tem um horário para aparecer e, quando a
+# conversão fica mais de um frame atrasada, os frames seguintes são descartados sem
+# serem convertidos até a reprodução alcançar o relógio.
+
+PLAYBACK_MODES = ("ansi", "plain")
+DEFAULT_FPS = 30 # Usado quando a fonte não informa o fps (comum em webcams)
+
+CLEAR_SCREEN = "\x1b[2J"
+CURSOR_HOME = "\x1b[H"
+HIDE_CURSOR = "\x1b[?25l"
+SHOW_CURSOR = "\x1b[?25h"
+RESET_COLORS = "\x1b[0m"
+
+class PlaybackStats:
+    def __init__(self):
+        self.frames = 0
+        self.dropped = 0
+        self.latencies = []
+        self.elapsed = 0
+
+    def __str__(self):
+        total = self.frames + self.dropped
+        fps = self.frames / self.elapsed if self.elapsed else 0
+        text = (f"Played {self.frames}/{total} frames ({self.dropped} dropped) "
+                f"in {self.elapsed:.2f} seconds ({fps:.1f} fps)")
+        if self.latencies:
+            latencies = np.array(self.latencies) * 1000
+            text += (f"\nFrame latency: mean {latencies.mean():.1f} ms, "
+                     f"p95 {np.percentile(latencies, 95):.1f} ms, max {latencies.max():.1f} ms")
+        return text
+
+# Cores de frente e de fundo do texto: a cor do filtro usada no branco da sprite sheet e a do resto
+def text_colors(colors, palette):
+    is_white = np.all(colors == WHITE, axis=1)
+    foreground = palette[is_white][0] if is_white.any() else palette[-1]
+    background = palette[~is_white][0] if not is_white.all() else palette[0]
+    return foreground, background
+
+def ansi_colors(foreground, background):
+    return "\x1b[38;2;{};{};{}m\x1b[48;2;{};{};{}m".format(*foreground, *background)
+
+# Um índice numérico ("0", "1", ...) abre a câmera correspondente
+def open_capture(source):
+    import cv2
+
+    if source.isdigit():
+        cap = cv2.VideoCapture(int(source))
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1) # Sempre o frame mais recente
+        return cap, True
+    return cv2.VideoCapture(source), False
+
+# Gera (grade de índices, momento da captura) para cada frame que deve ser mostrado.
+# Em arquivos, frames atrasados são só avançados com grab(), sem decodificação completa;
+# em câmeras a própria leitura dita o ritmo e o buffer de 1 frame descarta o excesso.
+def capture_grids(cap, is_device, resolution, high_contrast, sprite_width, sprite_height, sampling, stats):
+    import cv2
+
+    period = 1 / (cap.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS)
+    equalizer = ContrastEqualizer(contrast_mode(high_contrast))
+    start = perf_counter()
+    try:
+        number = 0
+        while True:
+            deadline = None if is_device else start + number * period
+            number += 1
+            if deadline is not None and perf_counter() > deadline + period:
+                if not cap.grab():
+                    break
+                stats.dropped += 1
+                continue
+
+            ret, frame = cap.read()
+            if not ret:
+                break
+            captured = perf_counter()
+            image = gray_image(frame)
+            indices, _ = image_to_indices(image, resolution, high_contrast, sprite_width, sprite_height, sampling, equalizer)
+            yield indices, captured, deadline
+    finally:
+        cap.release()
+
+# Mesma lógica para arquivos .pyascii, que já guardam as grades prontas
+def stored_grids(grid_name, stats):
+    with GridReader(grid_name) as reader:
+        fps = reader.metadata["fps"]
+        start = perf_counter()
+        deadline = start
+        for indices, duration in reader.frames():
+            frame_deadline = deadline
+            period = 1 / fps if fps else (duration or 100) / 1000
+            deadline += period
+            if perf_counter() > frame_deadline + period:
+                stats.dropped += 1
+                continue
+            yield indices, perf_counter(), frame_deadline
+
+# mode "ansi" redesenha o frame no lugar com as cores do filtro; "plain" escreve só o texto,
+# com uma linha em branco entre os frames (para redirecionar para arquivos ou outros programas).
+# As células de texto têm o dobro da altura dos sprites, já que os caracteres do terminal
+# são mais ou menos duas vezes mais altos do que largos.
+def play_terminal(source, resolution, high_contrast, colors, palette, sprite_width, sprite_height,
+                  sampling="area", mode="ansi", output=None):
+    output = output or sys.stdout
+    stats = PlaybackStats()
+    if is_grid_file(source):
+        grids = stored_grids(source, stats)
+    else:
+        cap, is_device = open_capture(source)
+        if not cap.isOpened():
+            raise FileNotFoundError(f"Could not open '{source}'!")
+        grids = capture_grids(cap, is_device, resolution, high_contrast, sprite_width, sprite_height * 2, sampling, stats)
+
+    prefix = ""
+    if mode == "ansi":
+        prefix = CURSOR_HOME + ansi_colors(*text_colors(colors, palette))
+        output.write(HIDE_CURSOR + CLEAR_SCREEN)
+
+    start = perf_counter()
+    broken_pipe = False
+    try:
+        for indices, captured, deadline in grids:
+            text = indices_to_text(indices)
+            waited = 0
+            if deadline is not None:
+                waited = max(0, deadline - perf_counter())
+                sleep(waited)
+            output.write(prefix + text if mode == "ansi" else text + "\n")
+            output.flush()
+            stats.latencies.append(perf_counter() - captured - waited)
+            stats.frames += 1
+    except KeyboardInterrupt:
+        pass
+    except BrokenPipeError:
+        broken_pipe = True # O programa que lia a saída foi fechado
+    finally:
+        grids.close()
+        stats.elapsed = perf_counter() - start
+        if mode == "ansi" and not broken_pipe:
+            output.write(RESET_COLORS + SHOW_CURSOR + "\n")
+            output.flush()
+    return stats
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+
+from PIL import Image
+from multiprocessing import Pool
+from collections import deque
+import numpy as np
+import struct
+import zlib
+from .renderer import scaled_size, grid_size, cells_to_indices, render_indices
+from .paths import default_output, default_workers
+from .profiling import span
+from .progress import report
+
+##### Tiled (Strip-wise) Images #####
+# Para imagens enormes, nem a fonte nem a saída ficam inteiras na memória:
+#   1. A fonte é lida em faixas horizontais e cada faixa é reduzida direto às linhas da grade de
+#      células (BOX com as mesmas coordenadas da redução da imagem inteira). Em formatos sem
+#      compressão (BMP, PPM/PGM, TIFF) cada processo decodifica só a sua faixa, ajustando os
+#      tiles do Pillow; JPEGs são decodificados já reduzidos (draft); os outros formatos
+#      (PNG, TIFF comprimido, ...) precisam ser decodificados inteiros.
+#   2. A grade (pequena) recebe o contraste e vira índices de sprite.
+#   3. A saída é renderizada em faixas e gravada como PNG com paleta, faixa por faixa. Cada
+#      processo comprime a sua faixa como um trecho independente do fluxo deflate (como o pigz).
+
+STRIP_BYTES = 64 * 1024 * 1024 # Tamanho padrão de uma faixa da fonte decodificada
+
+class TiledStats:
+    def __init__(self):
+        self.strips = 0
+        self.output_strips = 0
+        self.reading = "decoded strip by strip"
+
+    def __str__(self):
+        return f"Read the source in {self.strips} strips ({self.reading}) and wrote {self.output_strips} output strips"
+
+# O limite do Pillow contra "decompression bombs" não se aplica: a imagem nunca é carregada inteira
+def open_unbounded(image_name):
+    limit = Image.MAX_IMAGE_PIXELS
+    Image.MAX_IMAGE_PIXELS = None
+    try:
+        return Image.open(image_name)
+    finally:
+        Image.MAX_IMAGE_PIXELS = limit
+
+#### Source Strips ####
+
+# Tiles "raw" que cobrem a largura inteira podem ser lidos a partir de qualquer linha
+def supports_strips(image):
+    return bool(image.tile) and all(decoder == "raw" and box[0] == 0 and box[2] == image.width
+                                    for decoder, box, _, _ in image.tile)
+
+# Se o modo tiled consegue ler a imagem sem decodificá-la inteira: por faixas ou, em JPEGs, já reduzida.
+# Nos outros formatos (PNG, TIFF comprimido, ...) o crop decodifica a imagem toda.
+def streams_source(image):
+    return supports_strips(image) or image.format == "JPEG"
+
+# Tamanho em que o JPEG é decodificado com draft para a saída (reduzido por 1, 2, 4 ou 8)
+def draft_size(size, output_size):
+    width, height = size
+    scale = 1
+    while scale < 8 and width // (scale * 2) >= output_size[0] and height // (scale * 2) >= output_size[1]:
+        scale *= 2
+    return -(-width // scale), -(-height // scale)
+
+# Tiles que decodificam somente as linhas [top, bottom) da imagem
+def strip_tiles(image, top, bottom):
+    row_bytes = len(Image.new(image.mode, (image.width, 1)).tobytes())
+    tiles = []
+    for decoder, (_, tile_top, _, tile_bottom), offset, args in image.tile:
+        first, last = max(top, tile_top), min(bottom, tile_bottom)
+        if first >= last:
+            continue
+        rawmode, stride, orientation = (args, 0, 1) if isinstance(args, str) else (tuple(args) + (0, 1))[:3]
+        stride = stride or row_bytes
+        if orientation < 0: # Linhas gravadas de baixo para cima (BMP)
+            offset += (tile_bottom - last) * stride
+        else:
+            offset += (first - tile_top) * stride
+        tiles.append((decoder, (0, first - top, image.width, last - top), offset, (rawmode, stride, orientation)))
+    return tiles
+
+def load_strip(image_name, top, bottom):
+    image = open_unbounded(image_name)
+    image.tile = strip_tiles(image, top, bottom)
+    image._size = (image.width, bottom - top)
+    image.load()
+    return image
+
+# Faixas da fonte alinhadas às linhas da grade: (primeira linha da grade, última, topo, base na fonte)
+def source_strips(source_height, grid_height, strip_height):
+    rows_per_strip = max(1, strip_height * grid_height // source_height)
+    scale = source_height / grid_height
+    for first in range(0, grid_height, rows_per_strip):
+        last = min(grid_height, first + rows_per_strip)
+        yield first, last, int(first * scale), min(source_height, int(np.ceil(last * scale)))
+
+# Reduz uma faixa às linhas [first, last) da grade; box usa as mesmas coordenadas da redução
+# da imagem inteira, então o resultado é o de um único resize() (a menos de arredondamentos de 1 nível)
+def reduce_strip(strip, top, grid_width, first, last, scale):
+    box = (0, first * scale - top, strip.width, min(strip.height, last * scale - top))
+    return np.asarray(strip.convert("L").resize((grid_width, last - first), Image.BOX, box=box))
+
+def reduce_strip_task(task):
+    image_name, first, last, top, bottom, grid_width, scale = task
+    with span("reduce strip", row=first):
+        return reduce_strip(load_strip(image_name, top, bottom), top, grid_width, first, last, scale)
+
+#### Streaming PNG Output ####
+
+def png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+# adler32 de A + B a partir dos adler32 de A e de B (adler32_combine do zlib)
+def adler32_combine(adler1, adler2, length2):
+    base = 65521
+    remainder = length2 % base
+    sum1 = adler1 & 0xffff
+    sum2 = (remainder * sum1) % base
+    sum1 = (sum1 + (adler2 & 0xffff) + base - 1) % base
+    sum2 = (sum2 + ((adler1 >> 16) & 0xffff) + ((adler2 >> 16) & 0xffff) + base - remainder) % base
+    return sum1 | (sum2 << 16)
+
+# PNG com paleta (8 bits) gravado por partes: cada faixa comprimida vira um chunk IDAT
+class PngStreamWriter:
+    def __init__(self, filename, size, palette):
+        self.file = open(filename, "wb")
+        width, height = size
+        self.file.write(b"\x89PNG\r\n\x1a\n")
+        self.file.write(png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 3, 0, 0, 0)))
+        self.file.write(png_chunk(b"PLTE", palette.tobytes()))
+        self.file.write(png_chunk(b"IDAT", b"\x78\x9c")) # Cabeçalho zlib
+        self.adler = 1
+
+    # data é um trecho deflate terminado com Z_SYNC_FLUSH, com o adler32 e o tamanho dos dados originais
+    def write_compressed(self, data, adler, length):
+        self.file.write(png_chunk(b"IDAT", data))
+        self.adler = adler32_combine(self.adler, adler, length)
+
+    def close(self):
+        # Bloco deflate final vazio e o adler32 de todos os dados
+        self.file.write(png_chunk(b"IDAT", b"\x03\x00" + struct.pack(">I", self.adler)))
+        self.file.write(png_chunk(b"IEND", b""))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+tiled_settings = {}
+
+def init_tiled_worker(atlas):
+    tiled_settings.update(atlas=atlas)
+
+# Renderiza as linhas de células [first, last) e comprime as linhas do PNG (filtro 0 em cada linha)
+def compress_strip_task(task):
+    indices, output_width, output_height = task
+    with span("render strip"):
+        canvas = render_indices(indices, tiled_settings["atlas"], (output_width, output_height))
+        rows = np.zeros((output_height, output_width + 1), dtype=np.uint8)
+        rows[:, 1:] = canvas
+        data = rows.tobytes()
+    with span("compress strip"):
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+        return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH), zlib.adler32(data), len(data)
+
+#### Tiled Conversion ####
+
+def ordered_results(pool, function, tasks, max_in_flight):
+    in_flight = deque()
+    for task in tasks:
+        in_flight.append(pool.apply_async(function, (task,)))
+        if len(in_flight) >= max_in_flight:
+            yield in_flight.popleft().get()
+    while in_flight:
+        yield in_flight.popleft().get()
+
+# strip_height é o número de linhas da fonte por faixa; por padrão cada faixa decodificada tem
+# cerca de STRIP_BYTES (ou menos, se max_memory for dado). A memória usada depende da altura das
+# faixas e do número de processos, não do tamanho da imagem.
+# Só a amostragem "area" é suportada: a "point" reduz a imagem inteira com LANCZOS e equaliza pelo
+# histograma dela, o que não dá para fazer faixa por faixa.
+def tiled_image(image_name, output_file, atlas, palette, resolution, high_contrast, strip_height=None, workers=None, max_memory=None, sampling="area"):
+    if sampling != "area":
+        raise ValueError(f"Tiled mode supports only 'area' sampling, not '{sampling}'!")
+    if output_file == None:
+        output_file = default_output("PyAscii_image.png")
+    if not output_file.lower().endswith(".png"):
+        raise ValueError("Tiled mode writes PNG files only!")
+    if workers == None:
+        workers = default_workers()
+    max_in_flight = workers * 2
+
+    image = open_unbounded(image_name)
+    source_width, source_height = image.size
+    _, sprite_height, sprite_width = atlas.shape
+    output_width, output_height = scaled_size(image.size, resolution)
+    grid_width, grid_height = grid_size((output_width, output_height), sprite_width, sprite_height)
+    scale = source_height / grid_height
+    stats = TiledStats()
+
+    if strip_height == None:
+        strip_bytes = STRIP_BYTES if max_memory == None else max(1, max_memory // (2 * max_in_flight))
+        strip_height = max(1, strip_bytes // (source_width * 4))
+
+    with Pool(workers, initializer=init_tiled_worker, initargs=(atlas,)) as pool:
+        cells = np.empty((grid_height, grid_width), dtype=np.uint8)
+        strips = list(source_strips(source_height, grid_height, strip_height))
+        stats.strips = len(strips)
+        if supports_strips(image):
+            tasks = ((image_name, first, last, top, bottom, grid_width, scale) for first, last, top, bottom in strips)
+            for (first, last, _, _), rows in zip(strips, ordered_results(pool, reduce_strip_task, tasks, max_in_flight)):
+                cells[first:last] = rows
+        else:
+            stats.reading = "decoded whole, the format has no random access"
+            if image.format == "JPEG":
+                image.draft("L", (output_width, output_height)) # Decodifica já reduzido (1/2, 1/4 ou 1/8)
+                scale = image.height / grid_height
+                stats.reading = f"decoded at {image.width}x{image.height}"
+            for first, last, _, _ in source_strips(image.height, grid_height, strip_height):
+                top, bottom = int(first * scale), min(image.height, int(np.ceil(last * scale)))
+                strip = image.crop((0, top, image.width, bottom))
+                cells[first:last] = reduce_strip(strip, top, grid_width, first, last, scale)
+        image.close()
+
+        indices = cells_to_indices(Image.fromarray(cells), high_contrast)
+
+        # Saída: faixas de células com cerca de strip_height linhas de pixels cada
+        rows_per_strip = max(1, strip_height // sprite_height)
+        tasks = []
+        for first in range(0, grid_height, rows_per_strip):
+            last = min(grid_height, first + rows_per_strip)
+            tasks.append((indices[first:last], output_width, min(last * sprite_height, output_height) - first * sprite_height))
+        stats.output_strips = len(tasks)
+        with PngStreamWriter(output_file, (output_width, output_height), palette) as writer:
+            for number, (data, adler, length) in enumerate(ordered_results(pool, compress_strip_task, tasks, max_in_flight)):
+                writer.write_compressed(data, adler, length)
+                report(number + 1, len(tasks))
+    return stats
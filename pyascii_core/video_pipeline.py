@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+
+from multiprocessing import Pool
+from collections import deque
+import cv2
+from .renderer import scaled_size, grid_size, gray_image, image_to_cells, IncrementalRenderer, ReuseStats
+from .shm_transport import shared_memory_cells
+from .sprites import apply_palette
+from .paths import default_workers
+from .planner import plan_chunks
+from .profiling import span
+from .progress import report
+from .probe import probe_video
+from .chunk_cache import chunk_cache_limit, source_digest, chunk_key, load_chunk, save_chunk, evict_chunks
+
+##### Streaming Video Pipeline #####
+# O vídeo é decodificado uma única vez, cada frame passa pelo conversor
+# e o resultado é codificado uma única vez, sem subclipes temporários.
+
+# Decodifica os frames [start, end) um de cada vez (end = None lê até o fim do arquivo)
+def read_frames(video_name, start=0, end=None):
+    cap = cv2.VideoCapture(video_name)
+    if start:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    try:
+        while end is None or start < end:
+            with span("decode", frame=start):
+                ret, frame = cap.read()
+            start += 1
+            if not ret:
+                break
+            yield frame
+    finally:
+        cap.release()
+
+# Os frames devolvidos são views do buffer do renderer, válidas até o próximo frame.
+# first_frame é o número do primeiro frame no vídeo (usado somente no profiling)
+def convert_frames(frames, renderer, resolution, high_contrast, sampling="area", first_frame=0):
+    for number, frame in enumerate(frames, first_frame):
+        with span("convert", frame=number):
+            image = gray_image(frame)
+            canvas = renderer.render_image(image, resolution, high_contrast, sampling)
+        yield canvas
+
+# Aplica a paleta do filtro aos frames (índices) e os codifica com libx264;
+# o tamanho é obtido do primeiro frame. total_frames é usado somente no progresso.
+def write_frames(frames, output_path, fps, palette, total_frames=None):
+    # O moviepy demora para carregar, então só é importado quando um vídeo é de fato codificado
+    from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+
+    writer = None
+    try:
+        for number, frame in enumerate(frames):
+            if writer is None:
+                height, width = frame.shape
+                writer = FFMPEG_VideoWriter(output_path, (width, height), fps, codec='libx264')
+            with span("encode", frame=number):
+                writer.write_frame(apply_palette(frame, palette))
+            report(number + 1, total_frames)
+    finally:
+        if writer is not None:
+            writer.close()
+
+# info é o MediaInfo do vídeo (probe_video); se não for passado, o vídeo é aberto para obtê-lo
+def stream_video(video_name, output_path, atlas, palette, resolution, high_contrast, sampling="area", info=None):
+    info = info or probe_video(video_name)
+    renderer = IncrementalRenderer(atlas)
+    frames = convert_frames(read_frames(video_name), renderer, resolution, high_contrast, sampling)
+    write_frames(frames, output_path, info.fps, palette, info.frames)
+    return renderer.stats
+
+##### Frame-Range Parallel Decoding #####
+# Cada processo abre o vídeo original, pula para o primeiro frame do seu intervalo
+# e decodifica somente os frames [start, end). Não há subclipes em disco.
+# Os processos só reduzem os frames à grade de células; o contraste depende dos frames anteriores,
+# então ele é aplicado no processo principal, em ordem, junto com a renderização. Assim o resultado
+# é o mesmo do --streaming, qualquer que seja o número de processos ou o tamanho dos chunks.
+
+worker_settings = {}
+
+# digest é o hash da fonte para o cache de chunks, ou None com o cache desligado
+def init_worker(atlas_shape, resolution, high_contrast, sampling, digest=None):
+    worker_settings.update(atlas_shape=atlas_shape, resolution=resolution, high_contrast=high_contrast, sampling=sampling, digest=digest)
+
+# Divide [0, total) em intervalos de chunk_frames; o último vai até o fim do arquivo (end = None),
+# já que CAP_PROP_FRAME_COUNT é apenas uma estimativa em alguns containers
+def frame_ranges(total_frames, chunk_frames):
+    ranges = [(start, start + chunk_frames) for start in range(0, max(total_frames, 1), chunk_frames)]
+    ranges[-1] = (ranges[-1][0], None)
+    return ranges
+
+# Reduz cada frame à grade de células, gerando (células, histograma, tamanho de saída) como o image_to_cells
+def frames_to_cells(frames, atlas_shape, resolution, high_contrast, sampling="area", first_frame=0):
+    _, sprite_height, sprite_width = atlas_shape
+    for number, frame in enumerate(frames, first_frame):
+        with span("reduce", frame=number):
+            image = gray_image(frame)
+            yield image_to_cells(image, resolution, sprite_width, sprite_height, sampling, high_contrast)
+
+# Os frames são decodificados e reduzidos um a um; só as grades do chunk ficam em memória.
+# Com o cache de chunks, as grades do chunk são lidas do cache ou, depois de reduzidas, guardadas nele.
+# Na amostragem point com contraste o histograma vem da imagem inteira e não das células, então
+# esses chunks não passam pelo cache.
+def process_frame_range(video_name, start, end):
+    settings = dict(worker_settings)
+    atlas_shape, digest = settings.pop("atlas_shape"), settings.pop("digest")
+    if settings["sampling"] == "point" and settings["high_contrast"]:
+        digest = None
+    key = None if digest is None else chunk_key(digest, start, end, atlas_shape, settings["resolution"], settings["sampling"])
+    cached = None if key is None else load_chunk(key)
+    stats = ReuseStats()
+
+    with span("chunk", chunk=start):
+        if cached is not None:
+            grids, output_size = cached
+            cells = [(grid, None, output_size) for grid in grids]
+        else:
+            cells = list(frames_to_cells(read_frames(video_name, start, end), atlas_shape, first_frame=start, **settings))
+    if key is not None:
+        stats.chunks = 1
+        if cached is not None:
+            stats.chunks_cached = 1
+        elif cells:
+            save_chunk(key, [grid for grid, _, _ in cells], cells[0][2], (start, end))
+    return cells, stats
+
+# Pool persistente: cada processo pega um novo chunk da fila assim que termina o anterior.
+# No máximo max_in_flight chunks ficam em andamento/na memória; eles são entregues em ordem
+# assim que o próximo da sequência fica pronto, e só então um novo chunk é enviado.
+# Gera (células, histograma, tamanho de saída) de cada frame, na ordem do vídeo.
+def parallel_cells(video_name, total_frames, atlas_shape, resolution, high_contrast, sampling, chunk_frames, workers, max_in_flight, stats, digest=None):
+    ranges = frame_ranges(total_frames, chunk_frames)
+    with Pool(workers, initializer=init_worker, initargs=(atlas_shape, resolution, high_contrast, sampling, digest)) as pool:
+        in_flight = deque()
+        for start, end in ranges:
+            in_flight.append(pool.apply_async(process_frame_range, (video_name, start, end)))
+            if len(in_flight) >= max_in_flight:
+                yield from collect_chunk(in_flight.popleft(), stats)
+        while in_flight:
+            yield from collect_chunk(in_flight.popleft(), stats)
+
+def collect_chunk(result, stats):
+    with span("wait chunk"):
+        cells, chunk_stats = result.get()
+    stats.add(chunk_stats)
+    return cells
+
+# Aplica o contraste e renderiza as grades em ordem, com um único renderer (e um único equalizador)
+def render_cells(cells, renderer, high_contrast):
+    for number, (grid, histogram, output_size) in enumerate(cells):
+        with span("convert", frame=number):
+            canvas = renderer.render_cells(grid, output_size, high_contrast, histogram)
+        yield canvas
+
+# chunk_size é o número de frames por chunk; por padrão equivale a 5 segundos de vídeo.
+# max_memory (bytes) limita a memória ocupada pelos chunks reduzidos.
+def parallel_video(video_name, output_path, atlas, palette, resolution, high_contrast, sampling="area", chunk_size=None, workers=None, max_memory=None, info=None):
+    info = info or probe_video(video_name)
+    if workers is None:
+        workers = default_workers()
+    _, sprite_height, sprite_width = atlas.shape
+    cols, rows = grid_size(scaled_size(info.size, resolution), sprite_width, sprite_height)
+    chunk_size, max_in_flight = plan_chunks(cols * rows, workers, max(1, round(info.fps * 5)), chunk_size, max_memory)
+    renderer = IncrementalRenderer(atlas)
+    digest = None
+    if chunk_cache_limit() > 0:
+        with span("hash source"):
+            digest = source_digest(video_name)
+    cells = parallel_cells(video_name, info.frames, atlas.shape, resolution, high_contrast, sampling,
+                           chunk_size, workers, max_in_flight, renderer.stats, digest)
+    try:
+        write_frames(render_cells(cells, renderer, high_contrast), output_path, info.fps, palette, info.frames)
+    finally:
+        # Também quando a conversão falha ou é cancelada, já que os chunks prontos foram guardados
+        if digest is not None:
+            evict_chunks()
+    return renderer.stats
+
+# Um único decodificador alimenta os processos de renderização pela memória compartilhada
+def shared_memory_video(video_name, output_path, atlas, palette, resolution, high_contrast, sampling="area", workers=None, max_memory=None, info=None):
+    info = info or probe_video(video_name)
+    if workers is None:
+        workers = default_workers()
+    slots = workers * 4
+    if max_memory is not None:
+        # Cada slot guarda um frame em escala de cinza da fonte e a grade de células dele
+        _, sprite_height, sprite_width = atlas.shape
+        cols, rows = grid_size(scaled_size(info.size, resolution), sprite_width, sprite_height)
+        slot_bytes = info.width * info.height + cols * rows
+        slots = max(1, min(slots, max_memory // slot_bytes))
+    renderer = IncrementalRenderer(atlas)
+    cells = shared_memory_cells(video_name, atlas.shape, resolution, high_contrast, sampling, workers, slots)
+    write_frames(render_cells(cells, renderer, high_contrast), output_path, info.fps, palette, info.frames)
+    return renderer.stats
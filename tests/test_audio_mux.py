@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+from unittest import mock
+import importlib.util
+import tempfile
+import unittest
+import os
+
+HAS_MOVIEPY = importlib.util.find_spec("moviepy") is not None
+
+# Clipe curto gerado pelo ffmpeg (barras de teste), com ou sem um tom de áudio
+def make_clip(path, audio):
+    from pyascii_core.audio_mux import run_ffmpeg
+
+    args = ["-f", "lavfi", "-i", "testsrc=size=64x48:rate=10:duration=1"]
+    if audio:
+        args += ["-f", "lavfi", "-i", "sine=frequency=440:duration=1", "-c:a", "aac"]
+    result = run_ffmpeg(args + ["-c:v", "libx264", "-pix_fmt", "yuv420p", "-shortest", path])
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode(errors="replace"))
+
+@unittest.skipUnless(HAS_MOVIEPY, "moviepy (and its ffmpeg) is not installed")
+class AudioMuxTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.silent = os.path.join(self.folder.name, "silent.mp4")
+        self.with_audio = os.path.join(self.folder.name, "with_audio.mp4")
+        make_clip(self.silent, audio=False)
+        make_clip(self.with_audio, audio=True)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_mux_copies_the_audio_track(self):
+        from pyascii_core.audio_mux import mux_audio, has_audio
+
+        output = os.path.join(self.folder.name, "muxed.mp4")
+        mux_audio(self.silent, self.with_audio, output)
+        self.assertTrue(has_audio(output))
+
+    def test_mux_without_audio_keeps_the_video(self):
+        from pyascii_core.audio_mux import mux_audio, has_audio
+
+        output = os.path.join(self.folder.name, "muxed.mp4")
+        mux_audio(self.silent, self.silent, output)
+        self.assertTrue(os.path.getsize(output) > 0)
+        self.assertFalse(has_audio(output))
+
+    def test_video_processing_muxes_only_with_audio(self):
+        from pyascii_core.processing import video_processing
+        from pyascii_core.sprites import load_sprites
+        from pyascii_core import audio_mux
+
+        atlas, _, palette = load_sprites()
+        for source, audio in ((self.silent, False), (self.with_audio, True)):
+            with self.subTest(audio=audio):
+                output = os.path.join(self.folder.name, f"ascii_{audio}.mp4")
+                # Sem áudio na fonte, o vídeo convertido só é movido para o destino
+                with mock.patch.object(audio_mux, "mux_audio", wraps=audio_mux.mux_audio) as mux:
+                    video_processing(source, 64, False, atlas, palette, output, streaming=True)
+                self.assertEqual(mux.called, audio)
+                self.assertEqual(audio_mux.has_audio(output), audio)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+
+import subprocess
+import unittest
+import json
+import sys
+import os
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Bem acima do tempo medido (cerca de 0.1 s), só para pegar um import pesado que escapou
+MAX_IMPORT_SECONDS = 1.0
+
+# Importa o módulo em um interpretador novo e devolve (segundos, módulos pesados carregados)
+def import_in_subprocess(module):
+    code = ("import sys, time, json\n"
+            "start = time.perf_counter()\n"
+            f"import {module}\n"
+            "seconds = time.perf_counter() - start\n"
+            "heavy = sorted(name for name in ('cv2', 'moviepy', 'numpy') if name in sys.modules)\n"
+            "print(json.dumps([seconds, heavy]))\n")
+    result = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_DIR, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+class ImportTimeTest(unittest.TestCase):
+    def test_package_loads_nothing(self):
+        _, heavy = import_in_subprocess("pyascii_core")
+        self.assertEqual(heavy, [])
+
+    def test_no_video_libraries_on_import(self):
+        # Converter uma imagem ou um GIF não pode pagar pelo OpenCV e pelo moviepy
+        for module in ("pyascii_core.processing", "pyascii_core.api", "PyASCII"):
+            with self.subTest(module=module):
+                seconds, heavy = import_in_subprocess(module)
+                self.assertNotIn("cv2", heavy)
+                self.assertNotIn("moviepy", heavy)
+                self.assertLess(seconds, MAX_IMPORT_SECONDS)
+
+if __name__ == "__main__":
+    unittest.main()